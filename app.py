@@ -1,36 +1,115 @@
+import logging
+import os
+import uuid
+from typing import NamedTuple
 import matplotlib.pyplot as plt
-from dash import Dash, State, html, dcc, Input, Output
+from dash import ClientsideFunction, Dash, State, html, dcc, Input, Output
 import dash_bootstrap_components as dbc
+import flask
+from dash.exceptions import PreventUpdate
 import plotly.express as px
+import plotly.graph_objects as go
 import pandas as pd
 import matplotlib
-from utils import transform_column, build_flow_gdf, render_flow_map
+from clientside import aggregate_store
+from coalesce import Coalescer
+from cube import RideCube
+from daily_index import DailyIndex
+from dataset import RIDES_CSV, load_rides
+from density import density_bins
+from drop_watch import RIDES_DROP_DIR, DropWatcher
+from metrics import CallMetrics, prometheus_text
+from partitions import RIDES_PARTITIONS, PartitionedViews, PartitionStore
+from payload import binary_figure, payload_stats
+from render_pool import FlowMapRenderer
+from views import CachedSelections, FilteredViews
 
 matplotlib.use("Agg")
 
 THEME = "plotly_dark"
 
+# Selections with more points than this are sent to the scatterplot as a
+# server-side density grid of SCATTER_BINS x SCATTER_BINS cells
+SCATTER_MAX_POINTS = int(os.environ.get("SCATTER_MAX_POINTS", 50_000))
+SCATTER_BINS = 200
+# Columns the scatterplot can plot; the cached filtered selections hold only these
+SCATTER_COLUMNS = [
+    "Avg VTAT", "Avg CTAT", "Booking Value", "Ride Distance", "Driver Ratings", "Customer Rating", "Avg Speed",
+]
+
+# Recompute the counter, bar, pie and area charts in the browser from a shipped
+# aggregate store; only the scatterplot and flow map then call the server
+CLIENTSIDE_FILTERING = os.environ.get("CLIENTSIDE_FILTERING", "") not in ("", "0")
+
+# Bursts of filter changes from one page within this window are collapsed
+# into their latest state before the server callbacks compute anything
+COALESCE_WINDOW = float(os.environ.get("COALESCE_WINDOW_MS", 150)) / 1000
+
+# Processes rendering flow maps outside the request threads (0 renders inline)
+FLOW_MAP_PROCESSES = int(os.environ.get("FLOW_MAP_PROCESSES", 2))
+
 # Dataset loading and preprocesing ----------------------------------------------------------
-df = pd.read_csv("ncr_ride_bookings.csv", parse_dates=["Date"])
 
-# Change all object types to categorical types
-for col in df.select_dtypes(include="object", exclude="str"):
-    df[col] = df[col].astype("category")
 
-# Change Cancelled Rides by Driver / Customer and Incomplete Rides to boolean type
-df["Cancelled Rides by Customer"] = df["Cancelled Rides by Customer"].notna().astype("bool")
-df["Cancelled Rides by Driver"] = df["Cancelled Rides by Driver"].notna().astype("bool")
-df["Incomplete Rides"] = df["Incomplete Rides"].notna().astype("bool")
+class RideData(NamedTuple):
+    """One version of everything the callbacks read.
+
+    Loading and appending build a new RideData and swap it into ``data`` in one
+    assignment; callbacks read ``data`` once, so a swap during a call cannot
+    mix versions.
+    """
+    views: CachedSelections
+    cube: RideCube
+    daily: DailyIndex
+    client_store: dict
+    bounds: tuple  # first and last day with rides, or (None, None)
+
+
+def _ride_data(views, cube, daily) -> RideData:
+    client_store = aggregate_store(cube, THEME) if CLIENTSIDE_FILTERING else None
+    return RideData(views, cube, daily, client_store, views.bounds())
+
+
+def load_data(path: str = RIDES_CSV) -> RideData:
+    # Filtered selections for callbacks that need raw rows, pre-aggregated
+    # counts/sums for the charts and prefix sums for date-range totals.
+    # Month partitions are read as selections need them, so there is no
+    # single in-memory table
+    if RIDES_PARTITIONS:
+        store = PartitionStore(RIDES_PARTITIONS)
+        return _ride_data(PartitionedViews(store, columns=SCATTER_COLUMNS), *store.aggregates())
+    df = load_rides(path)
+    return _ride_data(FilteredViews(df, columns=SCATTER_COLUMNS), RideCube(df), DailyIndex(df))
+
+
+def append_rides(rows: pd.DataFrame):
+    """Add preprocessed ``rows`` to the data; only they are aggregated."""
+    global data
+    current = data
+    data = _ride_data(
+        current.views.append(rows),
+        RideCube.merge([current.cube, RideCube(rows)]),
+        DailyIndex.merge([current.daily, DailyIndex(rows)]),
+    )
+
 
-# Add average speed attribute in km/h
-df["Avg Speed"] = df["Ride Distance"] / (df["Avg CTAT"] / 60)
+# Set below, outside flow-map pool processes
+data = None
+call_metrics = CallMetrics()
+flow_maps = FlowMapRenderer(FLOW_MAP_PROCESSES, metrics=call_metrics)
+coalescer = Coalescer(COALESCE_WINDOW)
+drop_watcher = DropWatcher(RIDES_DROP_DIR, append_rides)
 
-# Add weekday and hour columns
-df["Weekday"] = df["Date"].dt.day_name()
-df["Hour"] = df["Time"].str.split(":").str[0]
 
-df["Pickup region"] = transform_column(df["Pickup Location"])
-df["Drop region"] = transform_column(df["Drop Location"])
+def reload_data(path: str = RIDES_CSV):
+    global data
+    new_data = load_data(path)
+    # Dropped batches are appended again to the reloaded data; under the
+    # watcher's lock none is appended to the old data meanwhile
+    with drop_watcher.lock:
+        data = new_data
+        drop_watcher.reset()
+        drop_watcher.poll()
 
 
 vehicle_options = [
@@ -54,224 +133,272 @@ def make_cell(children):
     )
 
 
+def initial_range(first, last) -> tuple:
+    # Open on the latest year of data; earlier years are a pick away
+    return max(first, last - pd.DateOffset(years=1) + pd.Timedelta(days=1)), last
+
+
+def date_picker(current: RideData) -> dcc.DatePickerRange:
+    first, last = current.bounds
+    if first is None:
+        dates = {}
+    else:
+        start, end = initial_range(first, last)
+        dates = dict(min_date_allowed=first, max_date_allowed=last, start_date=start, end_date=end)
+    return dcc.DatePickerRange(id="date-range-picker", display_format="YYYY‑MM‑DD", **dates)
+
+
+def covered_years(current: RideData) -> str:
+    first, last = current.bounds
+    if first is None:
+        return ""
+    if first.year == last.year:
+        return f" from {first.year}"
+    return f" from {first.year} to {last.year}"
+
+
+# With `python app.py`, flow-map pool processes import this script again as
+# __mp_main__; they only render maps, so they skip loading the data
+if __name__ != "__mp_main__":
+    data = load_data()
+    # Batches already in the drop directory are part of the data every worker
+    # starts with; workers poll for new ones once they serve requests
+    drop_watcher.poll()
+
+
 # DASH ---------------------------------------------------------------------------------------
-app = Dash(__name__, external_stylesheets=[dbc.themes.DARKLY])
-
-app.layout = html.Div(
-    style={"fontFamily": "Arial, sans-serif", "margin": "2rem"},
-    children=[
-        # title --------------------------------------------------------------------------------------------
-        html.H1("Uber Rides Data"),
-        html.P([
-            "The dataset contains rides from 2024 from New Delhi, India. It was taken from ",
-            html.A(
-                "this Kaggle dataset",
-                href="https://www.kaggle.com/datasets/yashdevladdha/uber-ride-analytics-dashboard",
-                target="_blank"
-            ),
-            "."
-        ]),
-        html.Hr(style={"margin-bottom": "10px"}),
-
-        # main part -----------------------------------------------------------------------------------------
-        html.Div(children=[
-            dbc.Row([
-                dbc.Col(children=[
-                    make_cell([
-                        html.Div(  # rides count
-                            html.H2(id="rides-count"),
-                            id="rides-count-container"
-                        )]),
-                    make_cell([
-                        html.Div(  # Date range picker div
-                            children=[
-                                html.Label("Date Range:", style={
-                                           "margin": "5px 10px"}),
-                                dcc.DatePickerRange(
-                                    id="date-range-picker",
-                                    min_date_allowed=pd.Timestamp(
-                                        "2024-01-01"),
-                                    max_date_allowed=pd.Timestamp(
-                                        "2024-12-31"),
-                                    start_date=pd.Timestamp("2024-01-01"),
-                                    end_date=pd.Timestamp("2024-12-31"),
-                                    display_format="YYYY‑MM‑DD",
-                                ),
-                            ],
-                            style={"margin": "10px"}
-                        ),
-                        html.Div(
-                            children=[  # Vehicle type checkboxes div
-                                dbc.Row([
-                                    dbc.Col([
-                                        html.Label("Vehicle Type:", className="text-white",
-                                                   style={"margin": "0 10px"})
-                                    ], width="auto", className="d-flex align-items-center"),
-
-                                    dbc.Col([
-                                        dbc.DropdownMenu(
-                                            id="vehicle-filter-label",
-                                            label="All 7 types selected",
-                                            children=[
-                                                dbc.Checklist(
-                                                    id="vehicle-types-checklist",
-                                                    options=vehicle_options,
-                                                    value=[x["value"]
-                                                           for x in vehicle_options],
-                                                    style={"padding": "10px"},
-                                                    inputStyle={
-                                                        "cursor": "pointer"},
-                                                    labelStyle={
-                                                        "cursor": "pointer", "whiteSpace": "nowrap"},
-                                                    switch=True
-                                                )
-                                            ],
-                                            toggle_style={
-                                                "backgroundColor": "#2b303b",
-                                                "border": "1px solid #4a4f5a",
-                                                "borderRadius": "20px",
-                                                "color": "#a0a5b0",
-                                                "fontSize": "0.9rem",
-                                                "padding": "0.3rem 1rem",
-                                                "textTransform": "none"
-                                            },
-                                            color="secondary",
-                                            direction="end", 
-                                        )
-                                    ], width="auto")
-                                ], align="center", className="g-0"),
-                            ],
-                            style={"margin": "20px 0 0 10px"}
-                        )]),
-
-                    make_cell([html.H3("Vehicle types barchart"),
-                              dcc.Graph(id="vehicle-types-barchart")])
-                ], width=6),
-                dbc.Col(children=[
-                    make_cell([
-                        html.H3("Ride Flow Map Between Delhi Districts"),
-                        html.Div(
-                            id="flow-map-container",
-                            children=[
-                                html.Iframe(
-                                    id="flow-map",
-                                    srcDoc="",  # Filled by callback below
-                                    style={
-                                        "width": "100%",
-                                        "height": "45.2rem",
-                                        "border": "1px solid #ddd",
-                                        "borderRadius": "5px"
-                                    }
-                                )
-                            ]
-                        )
-                    ]
-                    ),
-                ], width=6)
+app = Dash(__name__, external_stylesheets=[dbc.themes.DARKLY], compress=True)
+
+
+def make_layout(current: RideData) -> html.Div:
+    # Built per page load from one snapshot, so the dates shown and the
+    # picker's bounds always belong together
+    return html.Div(
+        style={"fontFamily": "Arial, sans-serif", "margin": "2rem"},
+        children=[
+            # title --------------------------------------------------------------------------------------------
+            html.H1("Uber Rides Data"),
+            html.P([
+                f"The dataset contains rides{covered_years(current)} from New Delhi, India. It was taken from ",
+                html.A(
+                    "this Kaggle dataset",
+                    href="https://www.kaggle.com/datasets/yashdevladdha/uber-ride-analytics-dashboard",
+                    target="_blank"
+                ),
+                "."
             ]),
+            html.Hr(style={"margin-bottom": "10px"}),
+
+            # main part -----------------------------------------------------------------------------------------
+            html.Div(children=[
+                dbc.Row([
+                    dbc.Col(children=[
+                        make_cell([
+                            html.Div(  # rides count
+                                html.H2(id="rides-count"),
+                                id="rides-count-container"
+                            )]),
+                        make_cell([
+                            html.Div(  # Date range picker div
+                                children=[
+                                    html.Label("Date Range:", style={
+                                               "margin": "5px 10px"}),
+                                    date_picker(current),
+                                ],
+                                style={"margin": "10px"}
+                            ),
+                            html.Div(
+                                children=[  # Vehicle type checkboxes div
+                                    dbc.Row([
+                                        dbc.Col([
+                                            html.Label("Vehicle Type:", className="text-white",
+                                                       style={"margin": "0 10px"})
+                                        ], width="auto", className="d-flex align-items-center"),
+
+                                        dbc.Col([
+                                            dbc.DropdownMenu(
+                                                id="vehicle-filter-label",
+                                                label="All 7 types selected",
+                                                children=[
+                                                    dbc.Checklist(
+                                                        id="vehicle-types-checklist",
+                                                        options=vehicle_options,
+                                                        value=[x["value"]
+                                                               for x in vehicle_options],
+                                                        style={"padding": "10px"},
+                                                        inputStyle={
+                                                            "cursor": "pointer"},
+                                                        labelStyle={
+                                                            "cursor": "pointer", "whiteSpace": "nowrap"},
+                                                        switch=True
+                                                    )
+                                                ],
+                                                toggle_style={
+                                                    "backgroundColor": "#2b303b",
+                                                    "border": "1px solid #4a4f5a",
+                                                    "borderRadius": "20px",
+                                                    "color": "#a0a5b0",
+                                                    "fontSize": "0.9rem",
+                                                    "padding": "0.3rem 1rem",
+                                                    "textTransform": "none"
+                                                },
+                                                color="secondary",
+                                                direction="end", 
+                                            )
+                                        ], width="auto")
+                                    ], align="center", className="g-0"),
+                                ],
+                                style={"margin": "20px 0 0 10px"}
+                            )]),
+
+                        make_cell([html.H3("Vehicle types barchart"),
+                                  dcc.Graph(id="vehicle-types-barchart")])
+                    ], width=6),
+                    dbc.Col(children=[
+                        make_cell([
+                            html.H3("Ride Flow Map Between Delhi Districts"),
+                            html.Div(
+                                id="flow-map-container",
+                                children=[
+                                    html.Iframe(
+                                        id="flow-map",
+                                        srcDoc="",  # Filled by callback below
+                                        style={
+                                            "width": "100%",
+                                            "height": "45.2rem",
+                                            "border": "1px solid #ddd",
+                                            "borderRadius": "5px"
+                                        }
+                                    )
+                                ]
+                            )
+                        ]
+                        ),
+                    ], width=6)
+                ]),
+
+
+                dbc.Row([
+                    dbc.Col([
+                        make_cell([
+                            html.Div(  # payment methods piechart
+                                children=[
+                                    html.H3("Payment methods piechart"),
+                                    dcc.Graph(id="payment-piechart",
+                                              style={"margin-top": "2rem"})
+                                ],
+                                id="payment-piechart-container",
+                            )])
+                    ], width=5),
+                    dbc.Col([
+                        make_cell([
+                            html.Div(  # Rides volume area chart
+                                children=[
+                                    html.H3("Rides volume area chart"),
+                                    html.Label("Group by", style={
+                                               "display": "inline"}),
+                                    dbc.RadioItems(
+                                        options=[
+                                            {"label": "Date", "value": "Date"},
+                                            {"label": "Weekday", "value": "Weekday"},
+                                            {"label": "Hour", "value": "Hour"},
+                                        ],
+                                        value="Date",
+                                        id="areachart-group-radio",
+                                        inline=True,
+                                        switch=True,
+                                        style={"display": "inline",
+                                               "margin-left": "10px"},
+                                    ),
+                                    dcc.Graph(id="areachart")
+                                ],
+                                id="areachart-container",
+                            )])
+                    ], width=7),
+                ]),
+                make_cell(html.Div(  # Scatterplot
+                    children=[
+                        html.H3("Numerical attributes scatterplot"),
+                        dbc.Row([
+                            dbc.Col([html.Label("X-axis:", style={"display": "inline-block", "margin-right": "0.75rem"}), dbc.Select(
+                                options=[
+                                    {"label": "Average Time - driver to pickup location",
+                                     "value": "Avg VTAT"},
+                                    {"label": "Average Time - pickup to destination",
+                                     "value": "Avg CTAT"},
+                                    {"label": "Booking Value",
+                                     "value": "Booking Value"},
+                                    {"label": "Ride Distance",
+                                     "value": "Ride Distance"},
+                                    {"label": "Driver Ratings",
+                                     "value": "Driver Ratings"},
+                                    {"label": "Customer Ratings",
+                                     "value": "Customer Rating"},
+                                    {"label": "Average Speed",
+                                     "value": "Avg Speed"},
+                                ],
+                                value="Ride Distance",
+                                id="scatterplot-x-axis",
+                                className="bg-dark text-white border-secondary",
+                                style={"display": "inline-block", "width": "auto"}
+                            )], width=4),
+                            dbc.Col([html.Label("Y-axis:", style={"display": "inline-block", "margin-right": "0.75rem"}), dbc.Select(
+                                options=[
+                                    {"label": "Average Time - driver to pickup location",
+                                     "value": "Avg VTAT"},
+                                    {"label": "Average Time - pickup to destination",
+                                     "value": "Avg CTAT"},
+                                    {"label": "Booking Value",
+                                     "value": "Booking Value"},
+                                    {"label": "Ride Distance",
+                                     "value": "Ride Distance"},
+                                    {"label": "Driver Ratings",
+                                     "value": "Driver Ratings"},
+                                    {"label": "Customer Ratings",
+                                     "value": "Customer Rating"},
+                                    {"label": "Average Speed",
+                                     "value": "Avg Speed"},
+                                ],
+                                value="Avg Speed",
+                                id="scatterplot-y-axis",
+                                className="bg-dark text-white border-secondary",
+                                style={"display": "inline-block", "width": "auto"}
+                            )], width=4),
+                        ], style={"margin": "1rem 0.5rem 0 0"}),
+                        dcc.Graph(id="scatterplot", style={"margin-top": "1rem"}),
+                    ],
+                    id="scatterplot-container",
+                )),
+            ])
+        ],
+    )
 
 
-            dbc.Row([
-                dbc.Col([
-                    make_cell([
-                        html.Div(  # payment methods piechart
-                            children=[
-                                html.H3("Payment methods piechart"),
-                                dcc.Graph(id="payment-piechart",
-                                          style={"margin-top": "2rem"})
-                            ],
-                            id="payment-piechart-container",
-                        )])
-                ], width=5),
-                dbc.Col([
-                    make_cell([
-                        html.Div(  # Rides volume area chart
-                            children=[
-                                html.H3("Rides volume area chart"),
-                                html.Label("Group by", style={
-                                           "display": "inline"}),
-                                dbc.RadioItems(
-                                    options=[
-                                        {"label": "Date", "value": "Date"},
-                                        {"label": "Weekday", "value": "Weekday"},
-                                        {"label": "Hour", "value": "Hour"},
-                                    ],
-                                    value="Date",
-                                    id="areachart-group-radio",
-                                    inline=True,
-                                    switch=True,
-                                    style={"display": "inline",
-                                           "margin-left": "10px"},
-                                ),
-                                dcc.Graph(id="areachart")
-                            ],
-                            id="areachart-container",
-                        )])
-                ], width=7),
-            ]),
-            make_cell(html.Div(  # Scatterplot
-                children=[
-                    html.H3("Numerical attributes scatterplot"),
-                    dbc.Row([
-                        dbc.Col([html.Label("X-axis:", style={"display": "inline-block", "margin-right": "0.75rem"}), dbc.Select(
-                            options=[
-                                {"label": "Average Time - driver to pickup location",
-                                 "value": "Avg VTAT"},
-                                {"label": "Average Time - pickup to destination",
-                                 "value": "Avg CTAT"},
-                                {"label": "Booking Value",
-                                 "value": "Booking Value"},
-                                {"label": "Ride Distance",
-                                 "value": "Ride Distance"},
-                                {"label": "Driver Ratings",
-                                 "value": "Driver Ratings"},
-                                {"label": "Customer Ratings",
-                                 "value": "Customer Rating"},
-                                {"label": "Average Speed",
-                                 "value": "Avg Speed"},
-                            ],
-                            value="Ride Distance",
-                            id="scatterplot-x-axis",
-                            className="bg-dark text-white border-secondary",
-                            style={"display": "inline-block", "width": "auto"}
-                        )], width=4),
-                        dbc.Col([html.Label("Y-axis:", style={"display": "inline-block", "margin-right": "0.75rem"}), dbc.Select(
-                            options=[
-                                {"label": "Average Time - driver to pickup location",
-                                 "value": "Avg VTAT"},
-                                {"label": "Average Time - pickup to destination",
-                                 "value": "Avg CTAT"},
-                                {"label": "Booking Value",
-                                 "value": "Booking Value"},
-                                {"label": "Ride Distance",
-                                 "value": "Ride Distance"},
-                                {"label": "Driver Ratings",
-                                 "value": "Driver Ratings"},
-                                {"label": "Customer Ratings",
-                                 "value": "Customer Rating"},
-                                {"label": "Average Speed",
-                                 "value": "Avg Speed"},
-                            ],
-                            value="Avg Speed",
-                            id="scatterplot-y-axis",
-                            className="bg-dark text-white border-secondary",
-                            style={"display": "inline-block", "width": "auto"}
-                        )], width=4),
-                    ], style={"margin": "1rem 0.5rem 0 0"}),
-                    dcc.Graph(id="scatterplot", style={"margin-top": "1rem"}),
-                ],
-                id="scatterplot-container",
-            )),
-        ])
-    ],
-)
+def serve_layout():
+    # Built per page load so clients pick up the data of the latest reload
+    current = data
+    # Identifies the page so its superseded callback requests can be dropped
+    stores = [dcc.Store(id="session-id", data=uuid.uuid4().hex)]
+    if CLIENTSIDE_FILTERING:
+        stores.append(dcc.Store(id="aggregate-store", data=current.client_store))
+    return html.Div([*stores, make_layout(current)])
+
+
+app.layout = serve_layout
+app.server.before_request(drop_watcher.start)
 
 # Callbacks --------------------------------------------------------------------------
 
-# callback for total rides text
 
+def filter_callback(*args, **kwargs):
+    # In clientside-filtering mode these outputs are computed in the browser
+    # (see assets/clientside.js) and the server callback is not registered
+    if CLIENTSIDE_FILTERING:
+        return lambda fn: fn
+    return app.callback(*args, **kwargs)
 
-@app.callback(
+
+@filter_callback(
     Output("vehicle-filter-label", "label"),
     Input("vehicle-types-checklist", "value"),
     State("vehicle-types-checklist", "options")
@@ -291,35 +418,36 @@ def update_vehicle_label(selected_values, options):
         return f"{count} types selected"
 
 
-@app.callback(
+# callback for total rides text
+@filter_callback(
     Output("rides-count", "children"),
     Input("date-range-picker", "start_date"),
     Input("date-range-picker", "end_date"),
-    Input("vehicle-types-checklist", "value")
+    Input("vehicle-types-checklist", "value"),
+    State("session-id", "data"),
 )
-def update_total_rides(start_date, end_date, vehicle_types):
-    count = len(df[
-        (df["Date"] >= start_date) &
-        (df["Date"] <= end_date) &
-        (df["Vehicle Type"].isin(vehicle_types))
-    ])
+@coalescer
+@call_metrics.timed
+def update_total_rides(start_date, end_date, vehicle_types, session_id=None):
+    current = data
+    count = current.daily.range_sum("rides", start_date, end_date, vehicle_types, rows=current.views.select)
 
     return f"Total rides: {count}"
 
 
 # callback for vehicle type barchart
-@app.callback(
+@filter_callback(
     Output("vehicle-types-barchart", "figure"),
     Input("date-range-picker", "start_date"),
     Input("date-range-picker", "end_date"),
-    Input("vehicle-types-checklist", "value")
+    Input("vehicle-types-checklist", "value"),
+    State("session-id", "data"),
 )
-def update_vehicle_types_barchart(start_date, end_date, vehicle_types):
-    filtered_df = df[
-        (df["Date"] >= start_date) &
-        (df["Date"] <= end_date) &
-        (df["Vehicle Type"].isin(vehicle_types))
-    ].groupby("Vehicle Type", observed=True).size().reset_index(name="Count")
+@coalescer
+@call_metrics.timed
+@binary_figure
+def update_vehicle_types_barchart(start_date, end_date, vehicle_types, session_id=None):
+    filtered_df = data.cube.by_vehicle_type(start_date, end_date, vehicle_types)
 
     fig = px.bar(
         filtered_df,
@@ -344,17 +472,24 @@ def update_vehicle_types_barchart(start_date, end_date, vehicle_types):
     Input("date-range-picker", "end_date"),
     Input("vehicle-types-checklist", "value"),
     Input("scatterplot-x-axis", "value"),
-    Input("scatterplot-y-axis", "value")
+    Input("scatterplot-y-axis", "value"),
+    State("session-id", "data"),
 )
-def update_scatterplot(start_date, end_date, vehicle_types, x_axis_attribute, y_axis_attribute):
-    filtered_df = df[
-        (df["Date"] >= start_date) &
-        (df["Date"] <= end_date) &
-        (df["Vehicle Type"].isin(vehicle_types))
-    ].dropna(subset=[x_axis_attribute, y_axis_attribute])  # drop any row where either is NaN
-
+@coalescer
+@call_metrics.timed
+@binary_figure
+def update_scatterplot(start_date, end_date, vehicle_types, x_axis_attribute, y_axis_attribute,
+                       session_id=None):
+    columns = list(dict.fromkeys([x_axis_attribute, y_axis_attribute]))
+    filtered_df = data.views.get(start_date, end_date, vehicle_types)[columns].dropna()  # drop any row where either is NaN
+
+    if len(filtered_df) > SCATTER_MAX_POINTS:
+        return density_heatmap(filtered_df, x_axis_attribute, y_axis_attribute)
+
+    # float32 keeps far more precision than the plot can show and halves the
+    # typed-array payload
     fig = px.scatter(
-        filtered_df,
+        filtered_df.astype("float32"),
         x=x_axis_attribute,
         y=y_axis_attribute,
         template=THEME,
@@ -375,22 +510,53 @@ def update_scatterplot(start_date, end_date, vehicle_types, x_axis_attribute, y_
     return fig
 
 
+def density_heatmap(filtered_df, x_axis_attribute, y_axis_attribute):
+    counts, x_edges, y_edges = density_bins(
+        filtered_df[x_axis_attribute], filtered_df[y_axis_attribute], SCATTER_BINS
+    )
+    # Empty cells are left transparent by the first colorscale stop, so the
+    # counts can be sent as a compact integer array without NaN padding
+    viridis = px.colors.sequential.Viridis
+    colorscale = [[0, "rgba(0,0,0,0)"]] + [
+        [max(i / (len(viridis) - 1), 1e-9), color] for i, color in enumerate(viridis)
+    ]
+
+    fig = go.Figure(go.Heatmap(
+        x=(x_edges[:-1] + x_edges[1:]) / 2,
+        y=(y_edges[:-1] + y_edges[1:]) / 2,
+        z=counts.T,
+        zmin=0,
+        colorscale=colorscale,
+        colorbar=dict(title="Rides"),
+        hovertemplate=f"{x_axis_attribute}=%{{x}}<br>{y_axis_attribute}=%{{y}}<br>Rides=%{{z}}<extra></extra>",
+    ))
+
+    fig.update_layout(
+        template=THEME,
+        title=dict(text=f"Density of {int(counts.sum()):,} rides", font=dict(size=14)),
+        xaxis_title=x_axis_attribute,
+        yaxis_title=y_axis_attribute,
+        margin=dict(t=40, l=20, r=20, b=20)
+    )
+
+    return fig
+
+
 # callback for payment method piechart
-@app.callback(
+@filter_callback(
     Output("payment-piechart", "figure"),
     Input("date-range-picker", "start_date"),
     Input("date-range-picker", "end_date"),
     Input("vehicle-types-checklist", "value"),
+    State("session-id", "data"),
 )
-def update_payment_piechart(start_date, end_date, vehicle_types):
-    filtered_df = df[
-        (df["Date"] >= start_date) &
-        (df["Date"] <= end_date) &
-        (df["Vehicle Type"].isin(vehicle_types))
-    ].groupby("Payment Method", observed=True).agg(
-        Count=("Payment Method", "size"),
-        Total_Revenue=("Booking Value", "sum")
-    ).reset_index()
+@coalescer
+@call_metrics.timed
+@binary_figure
+def update_payment_piechart(start_date, end_date, vehicle_types, session_id=None):
+    current = data
+    filtered_df = current.cube.by_payment_method(start_date, end_date, vehicle_types)
+    revenue = current.daily.range_sum("revenue", start_date, end_date, vehicle_types, rows=current.views.select)
 
     fig = px.pie(
         filtered_df,
@@ -403,7 +569,7 @@ def update_payment_piechart(start_date, end_date, vehicle_types):
     fig.update_layout(
         annotations=[
             dict(
-                text=f"<b>{int(filtered_df['Total_Revenue'].sum()):,} INR</b><br>Total Revenue <br>",
+                text=f"<b>{int(revenue):,} INR</b><br>Total Revenue <br>",
                 x=0.5,
                 y=0.5,
                 font_size=18,
@@ -418,22 +584,19 @@ def update_payment_piechart(start_date, end_date, vehicle_types):
 
 
 # callback for rides volume area chart
-@app.callback(
+@filter_callback(
     Output("areachart", "figure"),
     Input("date-range-picker", "start_date"),
     Input("date-range-picker", "end_date"),
     Input("vehicle-types-checklist", "value"),
-    Input("areachart-group-radio", "value")
+    Input("areachart-group-radio", "value"),
+    State("session-id", "data"),
 )
-def update_areachart(start_date, end_date, vehicle_types, grouping):
-    filtered_df = df[
-        (df["Date"] >= start_date) &
-        (df["Date"] <= end_date) &
-        (df["Vehicle Type"].isin(vehicle_types))
-    ].groupby(grouping, observed=True).agg(
-        completed=("Booking Status", lambda x: (x == "Completed").sum()),
-        not_completed=("Booking Status", lambda x: (x != "Completed").sum())
-    ).reset_index()
+@coalescer
+@call_metrics.timed
+@binary_figure
+def update_areachart(start_date, end_date, vehicle_types, grouping, session_id=None):
+    filtered_df = data.cube.by_completion(grouping, start_date, end_date, vehicle_types)
 
     filtered_df.columns = [grouping, 'Completed', 'Incomplete or Cancelled']
 
@@ -461,19 +624,80 @@ def update_areachart(start_date, end_date, vehicle_types, grouping):
     Output("flow-map", "srcDoc"),
     Input("date-range-picker", "start_date"),
     Input("date-range-picker", "end_date"),
-    Input("vehicle-types-checklist", "value")
+    Input("vehicle-types-checklist", "value"),
+    State("session-id", "data"),
 )
-def update_flow_map(start_date, end_date, vehicle_types):
-    filtered_df = df[
-        (df["Date"] >= start_date) &
-        (df["Date"] <= end_date) &
-        (df["Vehicle Type"].isin(vehicle_types))]
-    gdf_flows = build_flow_gdf(filtered_df)
-
-    html_map = render_flow_map(gdf_flows)
+@coalescer
+@call_metrics.timed
+def update_flow_map(start_date, end_date, vehicle_types, session_id=None):
+    flows = data.cube.flows(start_date, end_date, vehicle_types)
+
+    html_map = flow_maps.render(flows, session_id)
+    if html_map is None:  # a newer request from the same page replaced this one
+        raise PreventUpdate
     return html_map
 
 
+if CLIENTSIDE_FILTERING:
+    filter_inputs = [
+        Input("aggregate-store", "data"),
+        Input("date-range-picker", "start_date"),
+        Input("date-range-picker", "end_date"),
+        Input("vehicle-types-checklist", "value"),
+    ]
+    app.clientside_callback(
+        ClientsideFunction(namespace="rides", function_name="vehicleLabel"),
+        Output("vehicle-filter-label", "label"),
+        Input("vehicle-types-checklist", "value"),
+        State("vehicle-types-checklist", "options"),
+    )
+    app.clientside_callback(
+        ClientsideFunction(namespace="rides", function_name="totalRides"),
+        Output("rides-count", "children"),
+        *filter_inputs,
+    )
+    app.clientside_callback(
+        ClientsideFunction(namespace="rides", function_name="barchart"),
+        Output("vehicle-types-barchart", "figure"),
+        *filter_inputs,
+    )
+    app.clientside_callback(
+        ClientsideFunction(namespace="rides", function_name="piechart"),
+        Output("payment-piechart", "figure"),
+        *filter_inputs,
+    )
+    app.clientside_callback(
+        ClientsideFunction(namespace="rides", function_name="areachart"),
+        Output("areachart", "figure"),
+        *filter_inputs,
+        Input("areachart-group-radio", "value"),
+    )
+
+
+def metrics_sources() -> dict:
+    views = data.views
+    sources = {
+        "filtered_views": views.stats(),
+        "payload": payload_stats(),
+        "coalescer": coalescer.stats(),
+        "flow_map_pool": flow_maps.stats(),
+    }
+    if RIDES_PARTITIONS:
+        sources["partitions"] = getattr(views, "base", views).store.stats()
+    if RIDES_DROP_DIR:
+        sources["drop_dir"] = drop_watcher.stats()
+    return sources
+
+
+call_metrics.sources = metrics_sources
+
+
+@app.server.route("/metrics")
+def metrics_endpoint():
+    return flask.Response(prometheus_text(call_metrics), mimetype="text/plain; version=0.0.4")
+
+
 # Running the app ------------------------------------------------------------
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
     app.run(jupyter_mode="external", debug=True)  # inline/tab/external
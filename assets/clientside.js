@@ -0,0 +1,212 @@
+// Clientside versions of the aggregate callbacks in app.py, used when the
+// dashboard runs with CLIENTSIDE_FILTERING=1. They read the aggregate store
+// built by clientside.aggregate_store and mirror the server-side figures.
+(function () {
+    const TYPED_ARRAYS = {
+        i1: Int8Array, u1: Uint8Array, i2: Int16Array, u2: Uint16Array,
+        i4: Int32Array, u4: Uint32Array, f4: Float32Array, f8: Float64Array,
+    };
+    const MARGIN = {t: 40, l: 20, r: 20, b: 20};
+    const decoded = new WeakMap();
+
+    function decode(array) {
+        const bytes = Uint8Array.from(atob(array.bdata), c => c.charCodeAt(0));
+        return new TYPED_ARRAYS[array.dtype](bytes.buffer);
+    }
+
+    function arrays(store) {
+        let result = decoded.get(store);
+        if (!result) {
+            result = {
+                rides: decode(store.rides),
+                completed: decode(store.completed),
+                payments: decode(store.payments),
+                revenue: decode(store.revenue),
+            };
+            decoded.set(store, result);
+        }
+        return result;
+    }
+
+    // Date indices [first, last) and selected vehicle-type indices
+    function selection(store, startDate, endDate, vehicleTypes) {
+        const start = (startDate || "").slice(0, 10);
+        const end = (endDate || "").slice(0, 10);
+        let first = 0;
+        while (first < store.dates.length && store.dates[first] < start) first++;
+        let last = first;
+        while (last < store.dates.length && store.dates[last] <= end) last++;
+        const selected = new Set(vehicleTypes || []);
+        const vehicles = [];
+        store.vehicle_types.forEach((v, i) => { if (selected.has(v)) vehicles.push(i); });
+        return {first, last, vehicles};
+    }
+
+    function sumPerVehicle(store, values, width, sel, accumulate) {
+        const nVehicles = store.vehicle_types.length;
+        for (let d = sel.first; d < sel.last; d++) {
+            for (const v of sel.vehicles) {
+                const base = (d * nVehicles + v) * width;
+                for (let k = 0; k < width; k++) accumulate(d, v, k, values[base + k]);
+            }
+        }
+    }
+
+    function layout(store, extra) {
+        return Object.assign({template: store.template}, extra);
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        rides: {
+            vehicleLabel: function (selectedValues, options) {
+                if (!selectedValues || selectedValues.length === 0) {
+                    return "Select a vehicle type...";
+                }
+                const total = options.length;
+                const count = selectedValues.length;
+                if (count === total) return `All ${total} types selected`;
+                if (count <= 2) return selectedValues.join(", ");
+                return `${count} types selected`;
+            },
+
+            totalRides: function (store, startDate, endDate, vehicleTypes) {
+                const sel = selection(store, startDate, endDate, vehicleTypes);
+                let count = 0;
+                sumPerVehicle(store, arrays(store).rides, store.hours.length, sel,
+                    (d, v, h, n) => { count += n; });
+                return `Total rides: ${count}`;
+            },
+
+            barchart: function (store, startDate, endDate, vehicleTypes) {
+                const sel = selection(store, startDate, endDate, vehicleTypes);
+                const counts = new Array(store.vehicle_types.length).fill(0);
+                sumPerVehicle(store, arrays(store).rides, store.hours.length, sel,
+                    (d, v, h, n) => { counts[v] += n; });
+
+                const colorway = store.template.layout.colorway;
+                const observed = sel.vehicles.filter(v => counts[v] > 0);
+                const data = observed.map((v, i) => ({
+                    type: "bar",
+                    name: store.vehicle_types[v],
+                    legendgroup: store.vehicle_types[v],
+                    x: [store.vehicle_types[v]],
+                    y: [counts[v]],
+                    marker: {color: colorway[i % colorway.length]},
+                    orientation: "v",
+                    showlegend: true,
+                    hovertemplate: "Vehicle Type=%{x}<br>Count=%{y}<extra></extra>",
+                }));
+                const max = Math.max(0, ...observed.map(v => counts[v]));
+                return {
+                    data: data,
+                    layout: layout(store, {
+                        xaxis: {
+                            title: {text: "Vehicle Type"},
+                            categoryorder: "array",
+                            categoryarray: observed.map(v => store.vehicle_types[v]),
+                        },
+                        yaxis: {title: {text: "Count"}, range: [0, (Math.floor(max / 5000) + 1) * 5000]},
+                        legend: {title: {text: "Vehicle Type"}, tracegroupgap: 0},
+                        barmode: "relative",
+                        margin: MARGIN,
+                    }),
+                };
+            },
+
+            piechart: function (store, startDate, endDate, vehicleTypes) {
+                const sel = selection(store, startDate, endDate, vehicleTypes);
+                const data = arrays(store);
+                const counts = new Array(store.payment_methods.length).fill(0);
+                sumPerVehicle(store, data.payments, store.payment_methods.length, sel,
+                    (d, v, p, n) => { counts[p] += n; });
+                let revenue = 0;
+                sumPerVehicle(store, data.revenue, 1, sel, (d, v, k, value) => { revenue += value; });
+
+                const observed = counts.map((n, p) => p).filter(p => counts[p] > 0);
+                return {
+                    data: [{
+                        type: "pie",
+                        labels: observed.map(p => store.payment_methods[p]),
+                        values: observed.map(p => counts[p]),
+                        hole: 0.5,
+                        showlegend: true,
+                        hovertemplate: "Payment Method=%{label}<br>Count=%{value}<extra></extra>",
+                    }],
+                    layout: layout(store, {
+                        legend: {tracegroupgap: 0},
+                        annotations: [{
+                            text: `<b>${Math.trunc(revenue).toLocaleString("en-US")} INR</b><br>Total Revenue <br>`,
+                            x: 0.5,
+                            y: 0.5,
+                            font: {size: 18},
+                            showarrow: false,
+                            align: "center",
+                        }],
+                        margin: MARGIN,
+                    }),
+                };
+            },
+
+            areachart: function (store, startDate, endDate, vehicleTypes, grouping) {
+                const sel = selection(store, startDate, endDate, vehicleTypes);
+                const data = arrays(store);
+                const keyOf = {
+                    Date: (d, h) => store.dates[d],
+                    Weekday: (d, h) => store.weekdays[d],
+                    Hour: (d, h) => store.hours[h],
+                }[grouping];
+
+                const totals = new Map();
+                const completed = new Map();
+                const add = (map, key, n) => map.set(key, (map.get(key) || 0) + n);
+                sumPerVehicle(store, data.rides, store.hours.length, sel, (d, v, h, n) => {
+                    const key = keyOf(d, h);
+                    if (n > 0 && key !== null) add(totals, key, n);
+                });
+                sumPerVehicle(store, data.completed, store.hours.length, sel, (d, v, h, n) => {
+                    const key = keyOf(d, h);
+                    if (n > 0 && key !== null) add(completed, key, n);
+                });
+
+                // Hours are numbers, dates and weekdays strings; the default sort
+                // would compare the hours as strings
+                const keys = Array.from(totals.keys()).sort((a, b) => (a < b ? -1 : a > b ? 1 : 0));
+                const series = [
+                    ["Completed", keys.map(k => completed.get(k) || 0)],
+                    ["Incomplete or Cancelled", keys.map(k => totals.get(k) - (completed.get(k) || 0))],
+                ];
+                const colorway = store.template.layout.colorway;
+                return {
+                    data: series.map(([name, y], i) => ({
+                        type: "scatter",
+                        name: name,
+                        legendgroup: name,
+                        x: keys,
+                        y: y,
+                        mode: "lines",
+                        line: {color: colorway[i % colorway.length]},
+                        stackgroup: "1",
+                        orientation: "v",
+                        showlegend: true,
+                        hovertemplate: `Booking Status=${name}<br>${grouping}=%{x}<br>Number of Rides=%{y}<extra></extra>`,
+                    })),
+                    layout: layout(store, {
+                        xaxis: {title: {text: grouping}},
+                        yaxis: {title: {text: "Number of Rides"}},
+                        legend: {
+                            title: {text: "Booking Status"},
+                            tracegroupgap: 0,
+                            orientation: "h",
+                            yanchor: "bottom",
+                            y: 1.02,
+                            xanchor: "right",
+                            x: 1,
+                        },
+                        margin: {t: 60},
+                        hovermode: "x unified",
+                    }),
+                };
+            },
+        },
+    });
+})();
@@ -0,0 +1,180 @@
+"""Time preprocessing, the dashboard callbacks and the flow-map helpers on synthetic rides.
+
+Run from the repository root:
+    python benchmarks/bench_app.py [--rows 150000 1000000 10000000] [--compare benchmarks/results/OLD.json]
+
+Each row count runs in a fresh process, so startup is measured cold and the
+peak memory belongs to that size alone. Results are saved to
+benchmarks/results/<label>.json; the label defaults to the current git commit.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+ALL_VEHICLES = ["Auto", "Go Mini", "Go Sedan", "Bike", "Premier Sedan", "eBike", "Uber XL"]
+FILTERS = {
+    "year": ("2024-01-01", "2024-12-31", ALL_VEHICLES),
+    "month": ("2024-03-01", "2024-03-31", ["Auto", "Bike"]),
+}
+# (callback, extra arguments after the date range and vehicle types)
+CALLBACKS = [
+    ("update_total_rides", ()),
+    ("update_vehicle_types_barchart", ()),
+    ("update_payment_piechart", ()),
+    ("update_areachart", ("Date",)),
+    ("update_areachart", ("Hour",)),
+    ("update_scatterplot", ("Ride Distance", "Avg Speed")),
+    ("update_flow_map", ()),
+]
+
+
+def peak_rss_mib():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def measure(fn, repeat: int, setup=None) -> dict:
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return {
+        "median": statistics.median(timings),
+        "min": min(timings),
+        "peak_rss_mib": peak_rss_mib(),
+    }
+
+
+def run_sizes(csv: str, repeat: int) -> dict:
+    """Benchmarks for one CSV; runs inside the child process."""
+    # Render inline so the flow-map timings include the rendering itself
+    os.environ["FLOW_MAP_PROCESSES"] = "0"
+    os.environ["RIDES_CSV"] = csv
+
+    from dataset import load_rides
+
+    results = {"preprocess": measure(lambda: load_rides(csv, use_cache=False), 1)}
+    load_rides(csv)  # writes the cache the app starts from
+
+    start = time.perf_counter()
+    import app
+    results["startup"] = {"median": time.perf_counter() - start, "peak_rss_mib": peak_rss_mib()}
+
+    from utils import build_flow_gdf, render_flow_map
+
+    for filter_name, filters in FILTERS.items():
+        for name, extra in CALLBACKS:
+            callback = getattr(app, name)
+            key = "/".join([name, *extra, filter_name])
+            # Cleared each time so the shared filtered views do not turn
+            # every call after the first into a cache hit
+            results[key] = measure(lambda: callback(*filters, *extra), repeat, setup=app.data.views.clear)
+
+        rows = app.data.views.select(*filters)
+        results[f"build_flow_gdf/{filter_name}"] = measure(lambda: build_flow_gdf(rows), repeat)
+        gdf = build_flow_gdf(rows)
+        results[f"render_flow_map/{filter_name}"] = measure(lambda: render_flow_map(gdf), repeat)
+    return results
+
+
+def git_label() -> str:
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "local"
+
+
+def print_table(results: dict, baseline: dict = None):
+    for rows, stages in results.items():
+        print(f"\n{int(rows):,} rows")
+        header = f"{'stage':<58} {'median (ms)':>12} {'peak RSS (MiB)':>15}"
+        print(header + (f" {'vs baseline':>12}" if baseline else ""))
+        for stage, entry in stages.items():
+            line = f"{stage:<58} {entry['median'] * 1000:>12.1f} {entry['peak_rss_mib'] or 0:>15.0f}"
+            old = (baseline or {}).get(rows, {}).get(stage)
+            if old:
+                line += f" {entry['median'] / old['median']:>11.2f}x"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[150_000, 1_000_000, 10_000_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "rides-bench"))
+    parser.add_argument("--label", default=None, help="name of the results file (default: git commit)")
+    parser.add_argument("--compare", help="results file to compare the timings against")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_sizes(args.child, args.repeat)))
+        return
+
+    from synthetic_rides import write_rides
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    results = {}
+    for n in args.rows:
+        csv = os.path.join(args.data_dir, f"rides-{n}-s{args.seed}.csv")
+        if not os.path.exists(csv):
+            print(f"Generating {n:,} rides in {csv}", file=sys.stderr)
+            write_rides(csv, n, args.seed)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            child = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", csv, "--repeat", str(args.repeat)],
+                cwd=ROOT,
+                env={**os.environ, "RIDES_CACHE_DIR": cache_dir},
+                stdout=subprocess.PIPE,
+                text=True,
+                check=True,
+            )
+        results[str(n)] = json.loads(child.stdout.splitlines()[-1])
+
+    label = args.label or git_label()
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{label}.json")
+    with open(path, "w") as f:
+        json.dump({
+            "label": label,
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "repeat": args.repeat,
+            "results": results,
+        }, f, indent=1)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+    print_table(results, baseline)
+    print(f"\nSaved to {path}")
+
+
+if __name__ == "__main__":
+    main()
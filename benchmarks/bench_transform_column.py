@@ -0,0 +1,56 @@
+"""Compare per-row and per-category location-to-region mapping.
+
+Run from the repository root:
+    python benchmarks/bench_transform_column.py [--rows 150000 10000000]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Time the hand-maintained mapping only, without regions from the geocode store
+os.environ["GEOCODE_DB"] = ""
+
+from utils import get_admin_region, location_to_district, transform_column  # noqa: E402
+
+
+def per_row(series: pd.Series) -> pd.Series:
+    return series.apply(get_admin_region)
+
+
+def best_of(fn, series, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(series)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[150_000, 10_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    places = np.array(list(location_to_district), dtype=object)
+
+    # Location columns are strings or categoricals depending on the pandas
+    # version; categorical .apply already maps per category in recent pandas.
+    print(f"{'rows':>12} {'input':>9} {'per-row (s)':>12} {'per-category (s)':>17} {'speedup':>8}")
+    for n in args.rows:
+        names = pd.Series(places[rng.integers(0, len(places), n)])
+        for kind, series in (("string", names), ("category", names.astype("category"))):
+            slow, expected = best_of(per_row, series, 1 if n > 1_000_000 else args.repeat)
+            fast, result = best_of(transform_column, series, args.repeat)
+            assert (result.astype(object) == expected.astype(object)).all()
+            print(f"{n:>12,} {kind:>9} {slow:>12.3f} {fast:>17.4f} {slow / fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
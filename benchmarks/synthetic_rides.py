@@ -0,0 +1,136 @@
+"""Generate synthetic ride bookings shaped like ncr_ride_bookings.csv.
+
+Run from the repository root:
+    python benchmarks/synthetic_rides.py --rows 1000000 --out synthetic_1m.csv
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import location_to_district  # noqa: E402
+
+# Category shares roughly as in the Kaggle export
+BOOKING_STATUS = {
+    "Completed": 0.62,
+    "Cancelled by Driver": 0.18,
+    "No Driver Found": 0.07,
+    "Cancelled by Customer": 0.07,
+    "Incomplete": 0.06,
+}
+VEHICLE_TYPES = {
+    "Auto": 0.25,
+    "Go Mini": 0.20,
+    "Go Sedan": 0.18,
+    "Bike": 0.15,
+    "Premier Sedan": 0.12,
+    "eBike": 0.07,
+    "Uber XL": 0.03,
+}
+PAYMENT_METHODS = {
+    "UPI": 0.45,
+    "Cash": 0.25,
+    "Uber Wallet": 0.12,
+    "Credit Card": 0.10,
+    "Debit Card": 0.08,
+}
+CUSTOMER_REASONS = [
+    "Wrong Address",
+    "Change of plans",
+    "Driver is not moving towards pickup location",
+    "Driver asked to cancel",
+    "AC is not working",
+]
+DRIVER_REASONS = [
+    "Personal & Car related issues",
+    "Customer related issue",
+    "The customer was coughing/sick",
+    "More than permitted people in there",
+]
+INCOMPLETE_REASONS = ["Customer Demand", "Vehicle Breakdown", "Other Issue"]
+# Relative ride volume per hour of the day, with morning and evening peaks
+HOURLY_PROFILE = np.array([
+    1, 1, 1, 1, 1, 2, 3, 5, 7, 8, 7, 6, 6, 6, 6, 7, 8, 9, 10, 9, 7, 5, 3, 2,
+], dtype=float)
+
+CHUNK_ROWS = 1_000_000
+
+
+def _choice(rng, shares: dict, n: int) -> np.ndarray:
+    names = np.array(list(shares), dtype=object)
+    p = np.array(list(shares.values()))
+    return names[rng.choice(len(names), n, p=p / p.sum())]
+
+
+def _where(mask, values):
+    return np.where(mask, values, None)
+
+
+def generate_rides(n: int, seed: int = 0, year: int = 2024) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    days = pd.date_range(f"{year}-01-01", f"{year}-12-31").strftime("%Y-%m-%d").to_numpy(dtype=object)
+    seconds = np.arange(86400)
+    times = np.array(
+        [f"{s // 3600:02d}:{s % 3600 // 60:02d}:{s % 60:02d}" for s in seconds], dtype=object
+    )
+    hour = rng.choice(24, n, p=HOURLY_PROFILE / HOURLY_PROFILE.sum())
+    places = np.array(list(location_to_district), dtype=object)
+    # Some places are far busier than others
+    popularity = rng.pareto(1.5, len(places)) + 1
+
+    status = _choice(rng, BOOKING_STATUS, n)
+    completed = status == "Completed"
+    finished = completed | (status == "Incomplete")
+    distance = rng.gamma(2.5, 10, n).round(2)
+
+    return pd.DataFrame({
+        "Date": days[rng.integers(0, len(days), n)],
+        "Time": times[hour * 3600 + rng.integers(0, 3600, n)],
+        "Booking ID": np.char.add("CNR", rng.integers(1_000_000, 9_999_999, n).astype(str)).astype(object),
+        "Booking Status": status,
+        "Customer ID": np.char.add("CID", rng.integers(1_000_000, 9_999_999, n).astype(str)).astype(object),
+        "Vehicle Type": _choice(rng, VEHICLE_TYPES, n),
+        "Pickup Location": places[rng.choice(len(places), n, p=popularity / popularity.sum())],
+        "Drop Location": places[rng.choice(len(places), n, p=popularity / popularity.sum())],
+        "Avg VTAT": _where(status != "No Driver Found", rng.uniform(2, 20, n).round(1)),
+        "Avg CTAT": _where(finished, (distance * rng.uniform(1.2, 3.5, n) + 5).round(1)),
+        "Cancelled Rides by Customer": _where(status == "Cancelled by Customer", 1.0),
+        "Reason for cancelling by Customer": _where(
+            status == "Cancelled by Customer", rng.choice(CUSTOMER_REASONS, n)
+        ),
+        "Cancelled Rides by Driver": _where(status == "Cancelled by Driver", 1.0),
+        "Driver Cancellation Reason": _where(status == "Cancelled by Driver", rng.choice(DRIVER_REASONS, n)),
+        "Incomplete Rides": _where(status == "Incomplete", 1.0),
+        "Incomplete Rides Reason": _where(status == "Incomplete", rng.choice(INCOMPLETE_REASONS, n)),
+        "Booking Value": _where(finished, (50 + distance * rng.uniform(8, 25, n)).round()),
+        "Ride Distance": _where(finished, distance),
+        "Driver Ratings": _where(completed, rng.uniform(3, 5, n).round(1)),
+        "Customer Rating": _where(completed, rng.uniform(3, 5, n).round(1)),
+        "Payment Method": _where(finished, _choice(rng, PAYMENT_METHODS, n)),
+    })
+
+
+def write_rides(path: str, n: int, seed: int = 0):
+    # Written in chunks so that 10M-row files do not need 10M rows in memory
+    for i, start in enumerate(range(0, n, CHUNK_ROWS)):
+        chunk = generate_rides(min(CHUNK_ROWS, n - start), seed=seed + i)
+        chunk.to_csv(path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=150_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="synthetic_rides.csv")
+    args = parser.parse_args()
+
+    write_rides(args.out, args.rows, args.seed)
+    print(f"Wrote {args.rows:,} rides to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
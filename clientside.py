@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+import plotly.io as pio
+
+from cube import RideCube
+from payload import encode_array
+
+
+def aggregate_store(cube: RideCube, template: str) -> dict:
+    """Per-day x vehicle-type aggregates shipped to the browser for clientside filtering.
+
+    Arrays are flattened row-major typed arrays (see ``payload.encode_array``):
+    ``rides``/``completed`` are (date, vehicle type, hour) with a trailing
+    slot for rides without an hour, ``payments`` is (date, vehicle type,
+    payment method) and ``revenue`` is (date, vehicle type).
+    """
+    completed_slot = np.append(cube.statuses == "Completed", False)
+    dates = pd.DatetimeIndex(cube.dates)
+    return {
+        "dates": dates.strftime("%Y-%m-%d").tolist(),
+        "weekdays": dates.day_name().tolist(),
+        "vehicle_types": cube.vehicle_types.tolist(),
+        "hours": cube.hours.tolist() + [None],
+        "payment_methods": cube.payment_methods.tolist(),
+        "rides": encode_array(cube.status_counts.sum(axis=2).ravel()),
+        "completed": encode_array(cube.status_counts[:, :, completed_slot].sum(axis=2).ravel()),
+        "payments": encode_array(cube.payment_counts[:, :, :-1].ravel()),
+        "revenue": encode_array(cube.payment_revenue.sum(axis=2).ravel()),
+        "template": pio.templates[template].to_plotly_json(),
+    }
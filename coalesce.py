@@ -0,0 +1,83 @@
+import functools
+import inspect
+import threading
+import time
+
+from dash.exceptions import PreventUpdate
+
+
+class Coalescer:
+    """Collapses bursts of calls to a callback from one page into the latest one.
+
+    Decorated callbacks take the page's ``session_id``. A call that arrives
+    while an earlier call of the same callback from the same session is still
+    pending, or less than ``window`` seconds after one, is part of a burst: it
+    waits ``window`` seconds and gives up as soon as a newer call arrives
+    (*coalesced*). Other calls run immediately. A result superseded while it
+    was being computed is not sent either (*dropped*). Calls without a session
+    id run immediately.
+
+    Calls are only seen by the process that serves them, so behind several
+    server workers a burst spread over different workers is not coalesced.
+    """
+
+    def __init__(self, window: float = 0.15):
+        self.window = window
+        self._latest = {}
+        self._arrived = {}  # key -> when its latest call arrived
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, fn):
+        name = fn.__name__
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            session = signature.bind(*args, **kwargs).arguments.get("session_id")
+            if session is None:
+                return fn(*args, **kwargs)
+
+            key = (name, session)
+            superseded = threading.Event()
+            now = time.monotonic()
+            with self._lock:
+                previous = self._latest.get(key)
+                if previous is not None:
+                    previous.set()
+                burst = previous is not None or now - self._arrived.get(key, -self.window) < self.window
+                self._latest[key] = superseded
+                self._arrived[key] = now
+                self._forget_before(now - self.window)
+                self._count(name, "calls")
+
+            try:
+                if burst and superseded.wait(self.window):
+                    with self._lock:
+                        self._count(name, "coalesced")
+                    raise PreventUpdate
+                result = fn(*args, **kwargs)
+                if superseded.is_set():
+                    with self._lock:
+                        self._count(name, "dropped")
+                    raise PreventUpdate
+                return result
+            finally:
+                with self._lock:
+                    if self._latest.get(key) is superseded:
+                        del self._latest[key]
+        return wrapper
+
+    def _forget_before(self, cutoff: float):
+        # Callers hold self._lock; only arrivals within the window matter
+        if len(self._arrived) > 4 * len(self._latest) + 64:
+            self._arrived = {key: at for key, at in self._arrived.items() if at >= cutoff}
+
+    def _count(self, name: str, kind: str):
+        # Callers hold self._lock
+        counts = self._counts.setdefault(name, {"calls": 0, "coalesced": 0, "dropped": 0})
+        counts[kind] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {name: dict(counts) for name, counts in self._counts.items()}
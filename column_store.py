@@ -0,0 +1,97 @@
+import json
+import mmap
+import os
+
+import numpy as np
+import pandas as pd
+
+# Columns start on cache-line boundaries within the file
+_ALIGN = 64
+
+
+def _fixed_width(series: pd.Series):
+    """Array backing ``series`` and its manifest entry, or None if it cannot be mapped."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = series.cat.categories
+        if not pd.api.types.is_string_dtype(categories):
+            return None
+        codes = series.cat.codes.to_numpy()
+        return codes, {
+            "categories": categories.tolist(),
+            "categories_dtype": str(categories.dtype),
+            "ordered": bool(series.cat.ordered),
+        }
+    if isinstance(series.dtype, np.dtype) and series.dtype.kind in "biufmM":
+        return series.to_numpy(), {}
+    return None
+
+
+def write_columns(df: pd.DataFrame, path: str):
+    """Write the numeric, boolean, datetime and category-code columns of ``df`` to ``path``.
+
+    The layout is described by a JSON manifest next to the file, written last
+    so that its presence means the column file is complete.
+    """
+    manifest = {"rows": len(df), "columns": {}}
+    arrays = []
+    offset = 0
+    for name in df.columns:
+        fixed = _fixed_width(df[name])
+        if fixed is None:
+            continue
+        values, entry = fixed
+        values = np.ascontiguousarray(values)
+        manifest["columns"][name] = {"dtype": values.dtype.str, "offset": offset, **entry}
+        arrays.append((offset, values))
+        offset += -(-values.nbytes // _ALIGN) * _ALIGN
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        for start, values in arrays:
+            f.seek(start)
+            f.write(values.view(np.uint8).data)
+        # mmap cannot map an empty file
+        f.truncate(max(offset, _ALIGN))
+    os.replace(tmp_path, path)
+
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, f"{path}.json")
+
+
+def map_columns(df: pd.DataFrame, path: str) -> pd.DataFrame:
+    """Copy of ``df`` whose fixed-width columns are read-only views of a memory-mapped file.
+
+    The file is written on first use. Its pages live in the OS page cache, so
+    every process mapping the same file (forked workers or separate ones)
+    shares a single copy that never diverges. Text columns stay in process.
+    """
+    manifest_path = f"{path}.json"
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = None
+    if manifest is None or manifest["rows"] != len(df):
+        write_columns(df, path)
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    columns = {}
+    for name in df.columns:
+        entry = manifest["columns"].get(name)
+        if entry is None:
+            columns[name] = df[name]
+            continue
+        values = np.frombuffer(buffer, dtype=entry["dtype"], count=len(df), offset=entry["offset"])
+        if "categories" in entry:
+            dtype = pd.CategoricalDtype(
+                pd.Index(entry["categories"], dtype=entry["categories_dtype"]),
+                ordered=entry["ordered"],
+            )
+            values = pd.Categorical.from_codes(values, dtype=dtype)
+        columns[name] = pd.Series(values, index=df.index, name=name, copy=False)
+    return pd.DataFrame(columns, copy=False)
@@ -0,0 +1,92 @@
+"""Narrow in-memory layout for the preprocessed rides table."""
+import numpy as np
+import pandas as pd
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# Bits of the packed "Ride Flags" column
+FLAG_BITS = {
+    "Cancelled Rides by Customer": 1,
+    "Cancelled Rides by Driver": 2,
+    "Incomplete Rides": 4,
+}
+FLAGS_COLUMN = "Ride Flags"
+
+# Most decimals a float column may be recorded with to be considered for float32
+_MAX_DECIMALS = 6
+
+
+def float32_exact(values: np.ndarray) -> bool:
+    """Whether ``values`` survive float32 at the number of decimals they are recorded with.
+
+    Derived values without a fixed number of decimals stay float64.
+    """
+    values = values[np.isfinite(values)]
+    for decimals in range(_MAX_DECIMALS + 1):
+        if np.array_equal(np.round(values, decimals), values):
+            single = values.astype(np.float32).astype(np.float64)
+            return np.array_equal(np.round(single, decimals), values)
+    return False
+
+
+def compact(df: pd.DataFrame) -> pd.DataFrame:
+    """``df`` with Weekday and Hour as small codes, float32 metrics and packed flags."""
+    df = df.copy(deep=False)
+    if "Weekday" in df:
+        df["Weekday"] = pd.Categorical(df["Weekday"], categories=WEEKDAYS, ordered=True)
+    if "Hour" in df and not df["Hour"].hasnans:
+        df["Hour"] = df["Hour"].astype(np.int8)
+
+    for column in df.select_dtypes(include="float64"):
+        if float32_exact(df[column].to_numpy()):
+            df[column] = df[column].astype(np.float32)
+
+    flags = [name for name in FLAG_BITS if name in df]
+    if flags:
+        packed = np.zeros(len(df), dtype=np.uint8)
+        for name in flags:
+            packed |= df[name].to_numpy(dtype=bool).astype(np.uint8) * np.uint8(FLAG_BITS[name])
+        df = df.drop(columns=flags)
+        df[FLAGS_COLUMN] = packed
+    return df
+
+
+def flag(df: pd.DataFrame, name: str) -> pd.Series:
+    """One of the packed flags (e.g. ``"Incomplete Rides"``) as a boolean Series."""
+    return (df[FLAGS_COLUMN] & FLAG_BITS[name]).astype(bool).rename(name)
+
+
+def _wide_bytes(df: pd.DataFrame) -> dict:
+    # Per-column size of the layout before compact()
+    sizes = {}
+    for name in df.columns:
+        series = df[name]
+        if name == FLAGS_COLUMN:
+            for flag_name in FLAG_BITS:
+                sizes[flag_name] = len(df) * np.dtype(bool).itemsize
+        elif name == "Weekday":
+            sizes[name] = series.astype("str").memory_usage(index=False, deep=True)
+        elif name == "Hour" and series.dtype == np.int8:
+            sizes[name] = series.astype("Int8").memory_usage(index=False, deep=True)
+        elif series.dtype == np.float32:
+            sizes[name] = len(df) * np.dtype(np.float64).itemsize
+        else:
+            sizes[name] = series.memory_usage(index=False, deep=True)
+    return sizes
+
+
+def memory_report(df: pd.DataFrame) -> str:
+    """Per-column bytes of the compacted ``df`` against the layout it replaced."""
+    before = _wide_bytes(df)
+    after = df.memory_usage(index=False, deep=True).to_dict()
+    after.update({flag_name: 0 for flag_name in FLAG_BITS if FLAGS_COLUMN in df})
+
+    lines = [f"{'column':<36} {'dtype':>14} {'before':>12} {'after':>12} {'saved':>7}"]
+    for name in list(dict.fromkeys([*before, *after])):
+        old, new = before.get(name, 0), after.get(name, 0)
+        dtype = str(df[name].dtype) if name in df else f"in {FLAGS_COLUMN}"
+        saved = f"{1 - new / old:>6.0%}" if old else ""
+        lines.append(f"{name:<36} {dtype:>14} {old:>12,} {new:>12,} {saved:>7}")
+    old, new = sum(before.values()), sum(after.values())
+    lines.append(f"{'total':<36} {'':>14} {old:>12,} {new:>12,} {1 - new / old:>6.0%}" if old else "")
+    return "\n".join(lines)
@@ -0,0 +1,172 @@
+import numpy as np
+import pandas as pd
+
+
+def _axis(series: pd.Series) -> np.ndarray:
+    values = series.dropna()
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype(values.cat.categories.dtype)
+    return np.sort(np.asarray(values.unique()))
+
+
+def _codes(series: pd.Series, axis: np.ndarray) -> np.ndarray:
+    # Missing values (and values outside the axis) get the extra last slot
+    codes = pd.Categorical(series, categories=axis).codes.astype(np.int64)
+    codes[codes < 0] = len(axis)
+    return codes
+
+
+def _union(axes) -> np.ndarray:
+    axes = list(axes)
+    return np.unique(np.concatenate(axes)) if axes else np.array([])
+
+
+def _count(index: np.ndarray, shape: tuple, weights=None) -> np.ndarray:
+    return np.bincount(index, weights=weights, minlength=int(np.prod(shape))).reshape(shape)
+
+
+# Aggregate arrays and their axes after (date, vehicle type); each of these
+# axes has a trailing slot for missing values
+_ARRAY_AXES = {
+    "status_counts": ("statuses", "hours"),
+    "payment_counts": ("payment_methods",),
+    "payment_revenue": ("payment_methods",),
+    "flow_counts": ("regions", "regions"),
+}
+
+
+class RideCube:
+    """Dense, integer-coded count/sum aggregates of the rides table.
+
+    Every array is indexed by (date, vehicle type, ...); the trailing slot of
+    the remaining categorical axes holds rides with a missing value. Queries slice the
+    date axis, pick vehicle types and sum, so their cost depends on the number
+    of cells rather than the number of rides.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        df = df[df["Date"].notna() & df["Vehicle Type"].notna()]
+
+        self.dates = _axis(df["Date"])
+        self.vehicle_types = _axis(df["Vehicle Type"])
+        self.statuses = _axis(df["Booking Status"])
+        self.hours = _axis(df["Hour"])
+        self.payment_methods = _axis(df["Payment Method"])
+        self.regions = np.union1d(_axis(df["Pickup region"]), _axis(df["Drop region"]))
+
+        date = _codes(df["Date"], self.dates)
+        vehicle = _codes(df["Vehicle Type"], self.vehicle_types)
+        status = _codes(df["Booking Status"], self.statuses)
+        hour = _codes(df["Hour"], self.hours)
+        payment = _codes(df["Payment Method"], self.payment_methods)
+        pickup = _codes(df["Pickup region"], self.regions)
+        drop = _codes(df["Drop region"], self.regions)
+
+        n_dates, n_vehicles = len(self.dates), len(self.vehicle_types)
+        n_regions = len(self.regions) + 1
+
+        shape = (n_dates, n_vehicles, len(self.statuses) + 1, len(self.hours) + 1)
+        self.status_counts = _count(
+            np.ravel_multi_index((date, vehicle, status, hour), shape), shape
+        )
+
+        shape = (n_dates, n_vehicles, len(self.payment_methods) + 1)
+        index = np.ravel_multi_index((date, vehicle, payment), shape)
+        self.payment_counts = _count(index, shape)
+        self.payment_revenue = _count(
+            index, shape, weights=df["Booking Value"].fillna(0).to_numpy(dtype="float64")
+        )
+
+        shape = (n_dates, n_vehicles, n_regions, n_regions)
+        self.flow_counts = _count(
+            np.ravel_multi_index((date, vehicle, pickup, drop), shape), shape
+        )
+
+    @classmethod
+    def merge(cls, cubes: list) -> "RideCube":
+        """One cube over the rides of all ``cubes``, e.g. one per month or appended batch.
+
+        Their axes may differ and their dates may overlap; counts and sums of
+        the same cell are added.
+        """
+        cube = cls.__new__(cls)
+        for axis in ("dates", "vehicle_types", "statuses", "hours", "payment_methods", "regions"):
+            setattr(cube, axis, _union(getattr(part, axis) for part in cubes))
+
+        for name, axes in _ARRAY_AXES.items():
+            shape = (len(cube.dates), len(cube.vehicle_types), *(len(getattr(cube, axis)) + 1 for axis in axes))
+            total = np.zeros(shape, dtype=getattr(cubes[0], name).dtype)
+            for part in cubes:
+                # Each part's axis positions in the merged axes; every axis
+                # maps injectively, so the cells can be added in one step
+                index = [
+                    np.searchsorted(cube.dates, part.dates),
+                    np.searchsorted(cube.vehicle_types, part.vehicle_types),
+                ]
+                for axis in axes:
+                    merged = getattr(cube, axis)
+                    index.append(np.append(np.searchsorted(merged, getattr(part, axis)), len(merged)))
+                total[np.ix_(*index)] += getattr(part, name)
+            setattr(cube, name, total)
+        return cube
+
+    def _select(self, start_date, end_date, vehicle_types):
+        lo = np.searchsorted(self.dates, np.datetime64(pd.Timestamp(start_date)), side="left")
+        hi = np.searchsorted(self.dates, np.datetime64(pd.Timestamp(end_date)), side="right")
+        vehicles = np.flatnonzero(np.isin(self.vehicle_types, list(vehicle_types or [])))
+        return slice(lo, hi), vehicles
+
+    def by_vehicle_type(self, start_date, end_date, vehicle_types) -> pd.DataFrame:
+        dates, vehicles = self._select(start_date, end_date, vehicle_types)
+        counts = self.status_counts[dates][:, vehicles].sum(axis=(0, 2, 3))
+        observed = counts > 0
+        return pd.DataFrame({
+            "Vehicle Type": self.vehicle_types[vehicles][observed],
+            "Count": counts[observed],
+        })
+
+    def by_payment_method(self, start_date, end_date, vehicle_types) -> pd.DataFrame:
+        dates, vehicles = self._select(start_date, end_date, vehicle_types)
+        counts = self.payment_counts[dates][:, vehicles].sum(axis=(0, 1))[:-1]
+        revenue = self.payment_revenue[dates][:, vehicles].sum(axis=(0, 1))[:-1]
+        observed = counts > 0
+        return pd.DataFrame({
+            "Payment Method": self.payment_methods[observed],
+            "Count": counts[observed],
+            "Total_Revenue": revenue[observed],
+        })
+
+    def by_completion(self, grouping, start_date, end_date, vehicle_types) -> pd.DataFrame:
+        dates, vehicles = self._select(start_date, end_date, vehicle_types)
+        cells = self.status_counts[dates][:, vehicles].sum(axis=1)
+        completed_slot = np.append(self.statuses == "Completed", False)
+        completed = cells[:, completed_slot].sum(axis=1)
+        not_completed = cells[:, ~completed_slot].sum(axis=1)
+
+        if grouping == "Hour":
+            completed, not_completed = completed.sum(axis=0), not_completed.sum(axis=0)
+            keys = np.append(self.hours, None)
+        else:
+            completed, not_completed = completed.sum(axis=1), not_completed.sum(axis=1)
+            keys = self.dates[dates]
+            if grouping == "Weekday":
+                keys = pd.DatetimeIndex(keys).day_name()
+
+        grouped = pd.DataFrame({
+            grouping: keys,
+            "completed": completed,
+            "not_completed": not_completed,
+        })
+        grouped = grouped[grouped[grouping].notna()]
+        grouped = grouped.groupby(grouping, sort=True).sum().reset_index()
+        return grouped[(grouped["completed"] + grouped["not_completed"]) > 0].reset_index(drop=True)
+
+    def flows(self, start_date, end_date, vehicle_types) -> pd.DataFrame:
+        dates, vehicles = self._select(start_date, end_date, vehicle_types)
+        matrix = self.flow_counts[dates][:, vehicles].sum(axis=(0, 1))[:-1, :-1]
+        pickup, drop = np.nonzero(matrix)
+        return pd.DataFrame({
+            "Pickup region": self.regions[pickup],
+            "Drop region": self.regions[drop],
+            "volume": matrix[pickup, drop],
+        })
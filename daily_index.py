@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+
+
+def _row_metrics(df: pd.DataFrame) -> dict:
+    metrics = {
+        "rides": np.ones(len(df), dtype=np.int64),
+        "completed": (df["Booking Status"] == "Completed").to_numpy(dtype=np.int64),
+        "revenue": df["Booking Value"].fillna(0).to_numpy(dtype=np.float64),
+    }
+    payment = df["Payment Method"].astype(object)
+    for method in np.sort(np.asarray(payment.dropna().unique())):
+        metrics[f"payment:{method}"] = (payment == method).to_numpy(dtype=np.int64)
+    return metrics
+
+
+class DailyIndex:
+    """Per-day, per-vehicle-type prefix sums of ride metrics.
+
+    Row ``d + 1`` of every array holds the running total up to and including
+    day ``d`` (counted from the first day in the data), so the sum over any
+    date range is two lookups and a subtraction.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        df = df[df["Date"].notna() & df["Vehicle Type"].notna()]
+        days = df["Date"].dt.normalize()
+
+        self.first_day = days.min() if len(df) else pd.Timestamp(0)
+        self.n_days = (days.max() - self.first_day).days + 1 if len(df) else 0
+
+        vehicle = df["Vehicle Type"].astype(object)
+        self.vehicle_types = np.sort(np.asarray(vehicle.unique()))
+
+        day = ((days - self.first_day) // pd.Timedelta(days=1)).to_numpy(dtype=np.int64)
+        vehicle = np.searchsorted(self.vehicle_types, vehicle.to_numpy())
+        cell = day * len(self.vehicle_types) + vehicle
+        shape = (self.n_days, len(self.vehicle_types))
+
+        self.sums = {}
+        for name, values in _row_metrics(df).items():
+            daily = np.bincount(cell, weights=values, minlength=int(np.prod(shape)))
+            daily = daily.astype(values.dtype).reshape(shape)
+            self.sums[name] = np.concatenate([
+                np.zeros((1, shape[1]), dtype=values.dtype),
+                np.cumsum(daily, axis=0),
+            ])
+
+    @classmethod
+    def merge(cls, indexes: list) -> "DailyIndex":
+        """One index over the rides of all ``indexes``, whose days may overlap."""
+        parts = [part for part in indexes if part.n_days]
+        if not parts:
+            return indexes[0]
+
+        index = cls.__new__(cls)
+        index.first_day = min(part.first_day for part in parts)
+        last_day = max(part.first_day + pd.Timedelta(days=part.n_days - 1) for part in parts)
+        index.n_days = (last_day - index.first_day).days + 1
+        index.vehicle_types = np.unique(np.concatenate([part.vehicle_types for part in parts]))
+
+        daily = {}
+        for part in parts:
+            days = np.arange(part.n_days) + (part.first_day - index.first_day).days
+            vehicles = np.searchsorted(index.vehicle_types, part.vehicle_types)
+            for name, cumulative in part.sums.items():
+                if name not in daily:
+                    daily[name] = np.zeros((index.n_days, len(index.vehicle_types)), dtype=cumulative.dtype)
+                daily[name][np.ix_(days, vehicles)] += np.diff(cumulative, axis=0)
+
+        index.sums = {
+            name: np.concatenate([np.zeros((1, values.shape[1]), dtype=values.dtype), np.cumsum(values, axis=0)])
+            for name, values in daily.items()
+        }
+        return index
+
+    @property
+    def metrics(self) -> list:
+        return list(self.sums)
+
+    def _day_bounds(self, start_date, end_date):
+        start = (pd.Timestamp(start_date).ceil("D") - self.first_day).days
+        end = (pd.Timestamp(end_date).floor("D") - self.first_day).days + 1
+        start = min(max(start, 0), self.n_days)
+        end = min(max(end, start), self.n_days)
+        return start, end
+
+    def range_sum(self, metric, start_date, end_date, vehicle_types, rows=None):
+        """Sum ``metric`` over the date range and vehicle types.
+
+        Metrics that are not indexed are aggregated from the filtered rows
+        returned by ``rows(start_date, end_date, vehicle_types)``.
+        """
+        if metric not in self.sums:
+            if rows is None:
+                raise KeyError(f"Metric {metric!r} is not indexed")
+            return row_metric(metric, rows(start_date, end_date, vehicle_types))
+
+        start, end = self._day_bounds(start_date, end_date)
+        vehicles = np.isin(self.vehicle_types, list(vehicle_types or []))
+        cumulative = self.sums[metric]
+        return (cumulative[end, vehicles] - cumulative[start, vehicles]).sum().item()
+
+
+def row_metric(metric: str, df: pd.DataFrame):
+    if metric == "rides":
+        return len(df)
+    if metric == "completed":
+        return int((df["Booking Status"] == "Completed").sum())
+    if metric == "revenue":
+        return _sum64(df["Booking Value"])
+    if metric.startswith("payment:"):
+        return int((df["Payment Method"] == metric.removeprefix("payment:")).sum())
+    return _sum64(df[metric])
+
+
+def _sum64(values: pd.Series) -> float:
+    # Compacted value columns are float32; accumulate in float64 like the index does
+    return float(np.nansum(values.to_numpy(dtype=np.float64, na_value=np.nan)))
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import logging
+import os
+
+import pandas as pd
+
+from column_store import map_columns
+from compact import compact, memory_report
+from geocode_store import GeocodeStore
+from ingest import read_rides
+from utils import transform_column
+from views import sort_rides
+
+RIDES_CSV = os.environ.get("RIDES_CSV", "ncr_ride_bookings.csv")
+CACHE_DIR = os.environ.get("RIDES_CACHE_DIR", "cache")
+# Serve the fixed-width columns from a memory-mapped file shared by all processes
+SHARED_COLUMNS = os.environ.get("RIDES_SHARED_COLUMNS", "1") not in ("", "0")
+# Log the per-column memory of the loaded table against its uncompacted layout
+MEMORY_REPORT = os.environ.get("MEMORY_REPORT", "") not in ("", "0")
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever preprocess() changes so stale caches are not picked up
+PREPROCESS_VERSION = 5
+
+
+def preprocess(df: pd.DataFrame) -> pd.DataFrame:
+    """Derived columns for a table read by ``ingest.read_rides``."""
+    # Add average speed attribute in km/h
+    df["Avg Speed"] = df["Ride Distance"] / (df["Avg CTAT"] / 60)
+
+    # Add weekday and hour columns
+    df["Weekday"] = df["Date"].dt.day_name()
+    df["Hour"] = (df["Time"] // pd.Timedelta(hours=1)).astype("Int8")
+
+    df["Pickup region"] = transform_column(df["Pickup Location"])
+    df["Drop region"] = transform_column(df["Drop Location"])
+
+    # Keep rides ordered by date and vehicle type so date ranges are contiguous slices
+    return compact(sort_rides(df))
+
+
+def file_digest(path: str) -> str:
+    # Hashing a large export is the slowest part of a warm start, so digests
+    # are remembered per (size, mtime) and only recomputed when those change.
+    memo_path = os.path.join(CACHE_DIR, "rides-digests.json")
+    try:
+        with open(memo_path) as f:
+            memo = json.load(f)
+    except (OSError, ValueError):
+        memo = {}
+
+    stat = os.stat(path)
+    key = os.path.abspath(path)
+    entry = memo.get(key)
+    if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+        return entry["sha1"]
+
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha1.update(block)
+    memo[key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha1": sha1.hexdigest()}
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = f"{memo_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(memo, f)
+    os.replace(tmp_path, memo_path)
+    return memo[key]["sha1"]
+
+
+def cache_path(path: str, ext: str = "feather") -> str:
+    # Regions are resolved from the geocode store, so its version is part of the key
+    store = GeocodeStore().digest()
+    return os.path.join(
+        CACHE_DIR, f"rides-{file_digest(path)}-g{store}-v{PREPROCESS_VERSION}.{ext}"
+    )
+
+
+def load_rides(path: str = RIDES_CSV, use_cache: bool = True) -> pd.DataFrame:
+    if not use_cache:
+        df = preprocess(read_rides(path))
+    else:
+        df = _load_cached(path)
+        if SHARED_COLUMNS:
+            df = map_columns(df, cache_path(path, "columns"))
+    if MEMORY_REPORT:
+        logger.info("Rides table memory (bytes):\n%s", memory_report(df))
+    return df
+
+
+def _load_cached(path: str) -> pd.DataFrame:
+    cached = cache_path(path)
+    if os.path.exists(cached):
+        try:
+            return pd.read_feather(cached)
+        except ImportError:  # pyarrow is not installed
+            return preprocess(read_rides(path))
+
+    df = preprocess(read_rides(path))
+    tmp_path = f"{cached}.{os.getpid()}.tmp"
+    try:
+        df.to_feather(tmp_path)
+        os.replace(tmp_path, cached)
+    except ImportError:
+        pass
+    return df
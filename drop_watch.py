@@ -0,0 +1,134 @@
+"""Appends ride batches dropped into a directory while the dashboard runs.
+
+With ``RIDES_DROP_DIR=incoming`` every dashboard process polls the directory and
+appends new ``*.csv`` exports and ``*.feather`` batches (the export's columns,
+as exported) to its rides data. Files are only read, never moved or deleted;
+copy a batch in under a dot-prefixed name and rename it once complete.
+"""
+import logging
+import os
+import threading
+import time
+
+import pandas as pd
+
+from dataset import preprocess
+from ingest import convert_rides, read_rides
+
+RIDES_DROP_DIR = os.environ.get("RIDES_DROP_DIR", "")
+DROP_POLL_SECONDS = float(os.environ.get("RIDES_DROP_POLL_SECONDS", 5))
+
+logger = logging.getLogger(__name__)
+
+_READERS = {
+    ".csv": read_rides,
+    ".feather": lambda path: convert_rides(pd.read_feather(path)),
+}
+
+
+def read_batch(path: str) -> pd.DataFrame:
+    """Preprocessed rides of one batch file."""
+    return preprocess(_READERS[os.path.splitext(path)[1]](path))
+
+
+class DropWatcher:
+    """Hands each new batch file in ``directory``, preprocessed, to ``on_batch``.
+
+    Files are taken in name order once they have not been modified for
+    ``settle`` seconds, so a batch still being written is left for a later poll.
+    Each file is appended once per process: a batch that changes after it was
+    appended is not read again, one that failed is retried once it changes.
+    """
+
+    def __init__(self, directory: str, on_batch, interval: float = DROP_POLL_SECONDS, settle: float = None):
+        self.directory = directory
+        self.on_batch = on_batch
+        self.interval = interval
+        self.settle = interval if settle is None else settle
+        # Held while batches are appended; swapping the data under it cannot
+        # race a poll
+        self.lock = threading.RLock()
+        self.batches = 0
+        self.rows = 0
+        self.errors = 0
+        self._seen = {}  # file name -> (size, mtime_ns) when last looked at
+        self._appended = set()
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _new_files(self) -> list:
+        try:
+            entries = sorted(os.scandir(self.directory), key=lambda entry: entry.name)
+        except FileNotFoundError:
+            return []
+        now = time.time()
+        files = []
+        for entry in entries:
+            if entry.name.startswith(".") or os.path.splitext(entry.name)[1] not in _READERS:
+                continue
+            stat = entry.stat()
+            signature = (stat.st_size, stat.st_mtime_ns)
+            if not entry.is_file() or now - stat.st_mtime < self.settle or self._seen.get(entry.name) == signature:
+                continue
+            self._seen[entry.name] = signature
+            if entry.name in self._appended:
+                logger.warning("Ride batch %s changed after it was appended; the change is ignored", entry.path)
+                continue
+            files.append(entry)
+        return files
+
+    def poll(self) -> int:
+        """Append the batches that arrived since the last poll; returns how many."""
+        if not self.directory:
+            return 0
+        with self.lock:
+            appended = 0
+            for entry in self._new_files():
+                try:
+                    rows = read_batch(entry.path)
+                    if len(rows):
+                        self.on_batch(rows)
+                except Exception:
+                    self.errors += 1
+                    logger.exception("Could not append ride batch %s", entry.path)
+                    continue
+                self._appended.add(entry.name)
+                self.batches += 1
+                self.rows += len(rows)
+                appended += 1
+                logger.info("Appended %d rides from %s", len(rows), entry.path)
+            return appended
+
+    def reset(self):
+        """Forget the appended batches, e.g. after the data they were appended to was reloaded."""
+        with self.lock:
+            self._seen.clear()
+            self._appended.clear()
+            self.batches = 0
+            self.rows = 0
+
+    def start(self):
+        """Poll in a background thread of this process; threads do not survive a fork, so call again in workers."""
+        if not self.directory or self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name="drop-watcher", daemon=True).start()
+
+    def _run(self):
+        while True:
+            try:
+                self.poll()
+            except Exception:
+                logger.exception("Polling %s failed", self.directory)
+            time.sleep(self.interval)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "batches": self.batches,
+                "rows": self.rows,
+                "errors": self.errors,
+            }
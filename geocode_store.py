@@ -0,0 +1,247 @@
+"""Indexed local store of geocoded places.
+
+Place geometries come from Nominatim responses (the JSON files osmnx caches in
+cache/) and are kept in one SQLite database with WKB geometry. Lookups only
+read the database, so nothing on the request path touches the network.
+
+    python geocode_store.py import cache/*.json
+    python geocode_store.py fetch --locations        # every place in utils.location_to_district
+"""
+from __future__ import annotations
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sqlite3
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import geopandas as gpd
+
+GEOCODE_DB = os.environ.get("GEOCODE_DB", "cache/geocode.sqlite")
+
+# SQLite's default limit on bound parameters is 999
+_CHUNK = 900
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS places (
+    osm_type TEXT NOT NULL,
+    osm_id INTEGER NOT NULL,
+    name TEXT,
+    display_name TEXT,
+    class TEXT,
+    type TEXT,
+    importance REAL,
+    lat REAL,
+    lon REAL,
+    geometry BLOB NOT NULL,
+    source TEXT,
+    PRIMARY KEY (osm_type, osm_id)
+);
+CREATE TABLE IF NOT EXISTS names (
+    key TEXT NOT NULL,
+    osm_type TEXT NOT NULL,
+    osm_id INTEGER NOT NULL,
+    PRIMARY KEY (key, osm_type, osm_id)
+);
+"""
+
+
+def name_key(name: str) -> str:
+    return " ".join(str(name).split()).casefold()
+
+
+class GeocodeStore:
+    """Places by OSM id, findable by their name, display name or the query that found them."""
+
+    def __init__(self, path: str = GEOCODE_DB):
+        self.path = path
+
+    def _connect(self, readonly: bool = True) -> sqlite3.Connection:
+        if readonly:
+            return sqlite3.connect(f"file:{os.path.abspath(self.path)}?mode=ro", uri=True)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        connection = sqlite3.connect(self.path)
+        connection.executescript(_SCHEMA)
+        return connection
+
+    def add_results(self, results: list, source: str = None, aliases=()) -> int:
+        """Insert Nominatim results (with ``polygon_geojson``); returns how many were stored.
+
+        Each result can also be looked up by any of ``aliases``.
+        """
+        import shapely
+
+        rows, names = [], []
+        for result in results:
+            if "geojson" not in result:
+                continue
+            key = (result["osm_type"], int(result["osm_id"]))
+            geometry = shapely.from_geojson(json.dumps(result["geojson"]))
+            rows.append((
+                *key, result.get("name"), result.get("display_name"),
+                result.get("class"), result.get("type"), result.get("importance"),
+                float(result["lat"]), float(result["lon"]),
+                shapely.to_wkb(geometry), source,
+            ))
+            for name in (result.get("name"), result.get("display_name"), *aliases):
+                if name:
+                    names.append((name_key(name), *key))
+
+        with self._connect(readonly=False) as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO places VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            connection.executemany("INSERT OR IGNORE INTO names VALUES (?, ?, ?)", names)
+        connection.close()
+        return len(rows)
+
+    def import_json(self, paths) -> int:
+        """Import cached Nominatim response files; existing places are replaced."""
+        count = 0
+        for path in paths:
+            with open(path) as f:
+                results = json.load(f)
+            if isinstance(results, dict):
+                results = [results]
+            count += self.add_results(results, source=os.path.basename(path))
+        return count
+
+    def lookup(self, names) -> gpd.GeoDataFrame:
+        """Best match (highest importance) for each of ``names`` that is in the store.
+
+        The result is indexed by the given names, in WGS84; names without a
+        match are left out.
+        """
+        import geopandas as gpd
+        import shapely
+
+        names = list(dict.fromkeys(names))
+        by_key = {}
+        for name in names:
+            by_key.setdefault(name_key(name), []).append(name)
+
+        rows = []
+        if os.path.exists(self.path):
+            connection = self._connect()
+            try:
+                keys = list(by_key)
+                for i in range(0, len(keys), _CHUNK):
+                    chunk = keys[i:i + _CHUNK]
+                    rows += connection.execute(
+                        f"""
+                        SELECT n.key, p.osm_type, p.osm_id, p.display_name, p.importance,
+                               p.lat, p.lon, p.geometry
+                        FROM names n JOIN places p USING (osm_type, osm_id)
+                        WHERE n.key IN ({", ".join("?" * len(chunk))})
+                        ORDER BY n.key, p.importance DESC
+                        """,
+                        chunk,
+                    ).fetchall()
+            finally:
+                connection.close()
+
+        best = {}
+        for row in rows:
+            best.setdefault(row[0], row)
+        index, records, wkb = [], [], []
+        for key, row in best.items():
+            for name in by_key[key]:
+                index.append(name)
+                records.append(row[1:7])
+                wkb.append(row[7])
+
+        return gpd.GeoDataFrame(
+            records,
+            columns=["osm_type", "osm_id", "display_name", "importance", "lat", "lon"],
+            index=index,
+            geometry=shapely.from_wkb(wkb) if wkb else [],
+            crs="EPSG:4326",
+        )
+
+    def digest(self) -> str:
+        """Short hash that changes whenever places or names are added, replaced or removed.
+
+        Built from each table's row count and largest rowid; a replaced place
+        is reinserted under a new rowid.
+        """
+        state = ()
+        if os.path.exists(self.path):
+            connection = self._connect()
+            try:
+                state = connection.execute(
+                    "SELECT (SELECT COUNT(*) FROM places), (SELECT MAX(rowid) FROM places),"
+                    "       (SELECT COUNT(*) FROM names), (SELECT MAX(rowid) FROM names)"
+                ).fetchone()
+            finally:
+                connection.close()
+        return hashlib.sha1(repr(state).encode()).hexdigest()[:12]
+
+    def __len__(self) -> int:
+        if not os.path.exists(self.path):
+            return 0
+        connection = self._connect()
+        try:
+            return connection.execute("SELECT COUNT(*) FROM places").fetchone()[0]
+        finally:
+            connection.close()
+
+
+def fetch(store: GeocodeStore, queries: dict) -> int:
+    """Geocode ``queries`` with Nominatim through osmnx (network) and store the results.
+
+    ``queries`` maps each query to the names it should be found by. This is an
+    offline build step; the dashboard itself only calls ``lookup``.
+    """
+    import osmnx as ox
+    import shapely
+
+    count = 0
+    for query, aliases in queries.items():
+        try:
+            # Top match whatever its geometry type; pickup spots are often points
+            gdf = ox.geocode_to_gdf(query, which_result=1)
+        except ValueError as exc:
+            # No match is reported as InsufficientResponseError, a ValueError
+            # osmnx does not export publicly
+            if type(exc).__name__ != "InsufficientResponseError":
+                raise
+            continue
+        results = [
+            {**record, "geojson": json.loads(shapely.to_geojson(geometry))}
+            for record, geometry in zip(gdf.drop(columns="geometry").to_dict("records"), gdf.geometry)
+        ]
+        count += store.add_results(results, source="nominatim", aliases=[query, *aliases])
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=GEOCODE_DB)
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_parser = commands.add_parser("import", help="import cached Nominatim JSON files")
+    import_parser.add_argument("paths", nargs="*", default=sorted(glob.glob("cache/*.json")))
+    fetch_parser = commands.add_parser("fetch", help="geocode place names over the network")
+    fetch_parser.add_argument("queries", nargs="*")
+    fetch_parser.add_argument("--locations", action="store_true",
+                              help="also fetch every pickup/drop location known to utils")
+    args = parser.parse_args()
+
+    store = GeocodeStore(args.db)
+    if args.command == "import":
+        count = store.import_json(args.paths)
+    else:
+        queries = {query: [] for query in args.queries}
+        if args.locations:
+            from utils import location_to_district
+
+            # Bare place names are ambiguous; findable later by the bare name
+            queries.update({f"{place}, Delhi NCR, India": [place] for place in location_to_district})
+        count = fetch(store, queries)
+    print(f"Stored {count} places in {args.db} ({len(store)} in total)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""Schema-driven, chunked reading of the ride bookings export.
+
+The CSV is streamed in chunks of ``CHUNK_ROWS`` rows into columns allocated
+once for the whole file, so peak memory stays close to the size of the final
+table instead of several times it.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+CHUNK_ROWS = int(os.environ.get("RIDES_CHUNK_ROWS", 250_000))
+
+# How each column is stored: "date" (datetime64[us]), "time" (time of day as
+# timedelta64[s]), "category", "float64", "flag" (True where the field is
+# filled in) or "str". Columns not listed keep pandas' inferred types.
+RIDES_SCHEMA = {
+    "Date": "date",
+    "Time": "time",
+    "Booking ID": "str",
+    "Booking Status": "category",
+    "Customer ID": "str",
+    "Vehicle Type": "category",
+    "Pickup Location": "category",
+    "Drop Location": "category",
+    "Avg VTAT": "float64",
+    "Avg CTAT": "float64",
+    "Cancelled Rides by Customer": "flag",
+    "Reason for cancelling by Customer": "category",
+    "Cancelled Rides by Driver": "flag",
+    "Driver Cancellation Reason": "category",
+    "Incomplete Rides": "flag",
+    "Incomplete Rides Reason": "category",
+    "Booking Value": "float64",
+    "Ride Distance": "float64",
+    "Driver Ratings": "float64",
+    "Customer Rating": "float64",
+    "Payment Method": "category",
+}
+
+# Categories known in advance; values not listed here are added as they appear
+KNOWN_CATEGORIES = {
+    "Booking Status": [
+        "Cancelled by Customer", "Cancelled by Driver", "Completed", "Incomplete", "No Driver Found",
+    ],
+    "Vehicle Type": ["Auto", "Bike", "Go Mini", "Go Sedan", "Premier Sedan", "Uber XL", "eBike"],
+    "Payment Method": ["Cash", "Credit Card", "Debit Card", "UPI", "Uber Wallet"],
+}
+
+# dtype each kind is read with; dates and categories are parsed once per
+# distinct value rather than once per row
+_READ_DTYPES = {
+    "date": "category",
+    "time": "str",
+    "category": "category",
+    "float64": "float64",
+    "flag": "category",
+    "str": "str",
+}
+
+
+def count_rows(path: str) -> int:
+    """Upper bound on the number of records (quoted fields may contain newlines)."""
+    lines, last = 0, b"\n"
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            lines += block.count(b"\n")
+            last = block[-1:]
+    # Minus the header, plus an unterminated last line
+    return max(lines - 1 + (last != b"\n"), 0)
+
+
+def _parse_times(chunk: pd.Series) -> np.ndarray:
+    """``HH:MM:SS`` strings as timedelta64[s] since midnight."""
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+    except ImportError:
+        return pd.to_timedelta(chunk).to_numpy("timedelta64[s]")
+    # Arrow parses the fixed format far faster than pd.to_timedelta; the
+    # parsed timestamps fall on 1900-01-01
+    parsed = pc.strptime(pa.array(chunk.array, type=pa.string()), format="%H:%M:%S", unit="s")
+    seconds = pc.subtract(pc.cast(parsed, pa.int64()), int(pd.Timestamp("1900-01-01").timestamp()))
+    return pc.fill_null(seconds, np.iinfo(np.int64).min).to_numpy().view("timedelta64[s]")
+
+
+def _by_category(chunk: pd.Series, parsed: np.ndarray, missing) -> np.ndarray:
+    # Code -1 (missing) picks the appended last element
+    return np.append(parsed, missing)[chunk.cat.codes.to_numpy()]
+
+
+class _Column:
+    """Preallocated fixed-width column, filled chunk by chunk."""
+
+    def __init__(self, kind: str, capacity: int):
+        self.kind = kind
+        dtype = {
+            "date": "datetime64[us]",
+            "time": "timedelta64[s]",
+            "category": np.int32,  # codes
+            "float64": np.float64,
+            "flag": np.bool_,
+        }[kind]
+        self.values = np.empty(capacity, dtype=dtype)
+        self.categories = {}
+
+    def known(self, categories):
+        for category in categories:
+            self.categories.setdefault(category, len(self.categories))
+
+    def convert(self, chunk: pd.Series) -> np.ndarray:
+        if self.kind == "date":
+            categories = pd.to_datetime(chunk.cat.categories)
+            return _by_category(chunk, categories.to_numpy("datetime64[us]"), np.datetime64("NaT"))
+        if self.kind == "time":
+            return _parse_times(chunk)
+        if self.kind == "category":
+            self.known(chunk.cat.categories)
+            codes = [self.categories[category] for category in chunk.cat.categories]
+            return _by_category(chunk, np.array(codes, dtype=np.int32), -1)
+        if self.kind == "flag":
+            return chunk.notna().to_numpy()
+        return chunk.to_numpy(dtype=np.float64, na_value=np.nan)
+
+    def put(self, start: int, chunk: pd.Series):
+        values = self.convert(chunk)
+        end = start + len(values)
+        if end > len(self.values):  # the file grew after it was counted
+            self.values = np.resize(self.values, max(end, 2 * len(self.values)))
+        self.values[start:end] = values
+
+    def finish(self, rows: int):
+        values = self.values[:rows]
+        if self.kind != "category":
+            return values
+
+        # Unused categories are dropped and the rest sorted, as if the column
+        # had been converted from strings
+        names = np.array(list(self.categories), dtype=object)
+        used = np.bincount(values + 1, minlength=len(names) + 1)[1:] > 0
+        order = np.flatnonzero(used)[np.argsort(names[used], kind="stable")]
+        remap = np.full(len(names) + 1, -1, dtype=np.int32)
+        remap[order] = np.arange(len(order))
+        return pd.Categorical.from_codes(remap[values], categories=pd.Index(names[order].tolist(), dtype="str"))
+
+
+def _assemble(header, kinds: dict, chunks, capacity: int) -> pd.DataFrame:
+    fixed, parts = {}, {}
+    for name in header:
+        kind = kinds.get(name)
+        if kind in (None, "str"):
+            parts[name] = []
+        else:
+            fixed[name] = _Column(kind, capacity)
+            fixed[name].known(KNOWN_CATEGORIES.get(name, ()))
+
+    rows = 0
+    for chunk in chunks:
+        for name, column in fixed.items():
+            column.put(rows, chunk[name])
+        for name, series in parts.items():
+            series.append(chunk[name])
+        rows += len(chunk)
+
+    columns = {}
+    for name in header:
+        if name in fixed:
+            columns[name] = fixed.pop(name).finish(rows)
+        else:
+            series = parts.pop(name)
+            columns[name] = pd.concat(series, ignore_index=True) if series else pd.Series(dtype="str")
+    # copy=False keeps the preallocated arrays instead of consolidating them
+    return pd.DataFrame(columns, copy=False)
+
+
+def read_rides(path: str, chunk_rows: int = CHUNK_ROWS, schema: dict = RIDES_SCHEMA) -> pd.DataFrame:
+    """Read the bookings CSV at ``path`` with the column types of ``schema``."""
+    header = pd.read_csv(path, nrows=0).columns
+    kinds = {name: schema[name] for name in header if name in schema}
+    with pd.read_csv(
+        path, chunksize=chunk_rows, dtype={name: _READ_DTYPES[kind] for name, kind in kinds.items()}
+    ) as reader:
+        return _assemble(header, kinds, reader, count_rows(path))
+
+
+def convert_rides(df: pd.DataFrame, schema: dict = RIDES_SCHEMA) -> pd.DataFrame:
+    """Give a table with the export's columns as exported (e.g. a feather batch) the types of ``schema``."""
+    kinds = {name: schema[name] for name in df.columns if name in schema}
+    chunk = df.astype({name: _READ_DTYPES[kind] for name, kind in kinds.items()})
+    return _assemble(df.columns, kinds, [chunk], len(df))
@@ -0,0 +1,20 @@
+"""Write the cleaned, reprojected DELHI districts and their centroids to delhi_districts.npz.
+
+The artifact also holds topology-preserving simplified borders at each of
+utils.SIMPLIFY_TOLERANCES, with their measured deviation from the originals.
+
+Run from the repository root whenever DISTRICT_BOUNDARY.* changes:
+
+    python input/build_districts.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import DISTRICT_ARTIFACT, load_districts, write_district_artifact  # noqa: E402
+
+delhi = load_districts()
+write_district_artifact(delhi)
+
+print(f"Saved {len(delhi)} districts to {DISTRICT_ARTIFACT} ({os.path.getsize(DISTRICT_ARTIFACT):,} bytes)")
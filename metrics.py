@@ -0,0 +1,351 @@
+"""Per-call latency, rows, payload and allocation metrics in the Prometheus text format."""
+import bisect
+import contextvars
+import cProfile
+import functools
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+
+import plotly.io as pio
+from dash.exceptions import PreventUpdate
+
+from payload import PAYLOAD_REPORT
+
+logger = logging.getLogger(__name__)
+
+# Calls slower than this are profiled with cProfile and the profile is written
+# to SLOW_CALL_DIR (0 turns profiling off; profiled calls run somewhat slower)
+SLOW_CALL_MS = float(os.environ.get("SLOW_CALL_MS", 0))
+SLOW_CALL_DIR = os.environ.get("SLOW_CALL_DIR", "slow_calls")
+
+# Peak allocation per call needs tracemalloc, which slows down every
+# allocation in the process, so it is opt-in
+TRACE_ALLOCATIONS = os.environ.get("METRICS_TRACEMALLOC", "") not in ("", "0")
+
+# Directory shared by the server processes: each one publishes its metrics
+# there and /metrics, whichever process answers it, reports all of them.
+# Empty keeps metrics per process.
+METRICS_DIR = os.environ.get("METRICS_DIR", "")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+if TRACE_ALLOCATIONS and not tracemalloc.is_tracing():
+    tracemalloc.start()
+
+_rows = contextvars.ContextVar("rows", default=None)
+_measuring = contextvars.ContextVar("measuring", default=False)
+
+
+def scanned(n: int):
+    """Count ``n`` rows read by the call being timed in this thread, if any."""
+    counter = _rows.get()
+    if counter is not None:
+        counter[0] += n
+
+
+class measure:
+    """Times the enclosed block; sets ``seconds`` and ``peak`` (bytes, or None).
+
+    Only the outermost measurement in a thread profiles and traces allocations,
+    since nested profilers and peak resets would disturb it.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.seconds = None
+        self.peak = None
+
+    def __enter__(self):
+        self._outermost = not _measuring.get()
+        self._token = _measuring.set(True)
+        self._profile = None
+        if self._outermost and SLOW_CALL_MS:
+            self._profile = cProfile.Profile()
+            try:
+                self._profile.enable()
+            except ValueError:  # another profiler is active (Python 3.12+ allows one)
+                self._profile = None
+        if self._outermost and TRACE_ALLOCATIONS:
+            tracemalloc.reset_peak()
+            self._traced = tracemalloc.get_traced_memory()[0]
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.seconds = time.perf_counter() - self._start
+        if self._outermost and TRACE_ALLOCATIONS:
+            self.peak = max(tracemalloc.get_traced_memory()[1] - self._traced, 0)
+        if self._profile is not None:
+            self._profile.disable()
+            if self.seconds * 1000 >= SLOW_CALL_MS:
+                self._dump_profile()
+        _measuring.reset(self._token)
+
+    def _dump_profile(self):
+        os.makedirs(SLOW_CALL_DIR, exist_ok=True)
+        path = os.path.join(
+            SLOW_CALL_DIR,
+            f"{self.name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self.seconds * 1000:.0f}ms.prof",
+        )
+        self._profile.dump_stats(path)
+        logger.warning("%s took %.0f ms, profile written to %s", self.name, self.seconds * 1000, path)
+
+
+def payload_size(output) -> int:
+    if isinstance(output, str):
+        return len(output.encode())
+    return len(pio.json.to_json_plotly(output))
+
+
+class CallMetrics:
+    """Latency histograms and per-call rows, payload and peak allocation by call name.
+
+    Rows are the ride rows a call read through ``scanned`` (filtered views
+    count their selection); calls answered from the pre-aggregated cube read none.
+    Payload bytes are recorded with ``PAYLOAD_REPORT`` only, as measuring them
+    serialises the output a second time.
+
+    With a ``directory`` every observation is published to a file of this
+    process, together with the ``stats()`` dicts returned by ``sources``.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS, directory: str = METRICS_DIR):
+        self.buckets = tuple(buckets)
+        self.directory = directory
+        self.sources = dict
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._publish_lock = threading.Lock()
+
+    def observe(self, name: str, seconds: float, outcome: str = "ok",
+                rows: int = None, payload: int = None, peak: int = None):
+        with self._lock:
+            entry = self._calls.get(name)
+            if entry is None:
+                entry = self._calls[name] = {
+                    "outcomes": {},
+                    "buckets": [0] * (len(self.buckets) + 1),
+                    "seconds": 0.0,
+                }
+            entry["outcomes"][outcome] = entry["outcomes"].get(outcome, 0) + 1
+            entry["buckets"][bisect.bisect_left(self.buckets, seconds)] += 1
+            entry["seconds"] += seconds
+            for key, value in (("rows", rows), ("payload_bytes", payload), ("peak_bytes", peak)):
+                if value is not None:
+                    total, count, largest = entry.get(key, (0, 0, 0))
+                    entry[key] = (total + value, count + 1, max(largest, value))
+        self.publish()
+
+    def _path(self) -> str:
+        return os.path.join(self.directory, f"metrics-{os.getpid()}.json")
+
+    def _snapshot(self) -> dict:
+        with self._lock:
+            return {
+                name: {**entry, "outcomes": dict(entry["outcomes"]), "buckets": list(entry["buckets"])}
+                for name, entry in self._calls.items()
+            }
+
+    def publish(self):
+        """Write this process's metrics to ``directory``, if there is one."""
+        if not self.directory:
+            return
+        # Serialised so an older snapshot never replaces a newer one
+        with self._publish_lock:
+            state = {"pid": os.getpid(), "calls": self._snapshot(), "sources": self.sources()}
+            path = self._path()
+            tmp_path = f"{path}.tmp"
+            try:
+                with open(tmp_path, "w") as f:
+                    json.dump(state, f)
+                os.replace(tmp_path, path)
+            except OSError:
+                logger.warning("Could not publish metrics to %s", path, exc_info=True)
+
+    def reset(self):
+        """Forget everything recorded so far, e.g. by warm-up calls in a preloading master."""
+        with self._lock:
+            self._calls.clear()
+        if self.directory:
+            with self._publish_lock:
+                try:
+                    os.remove(self._path())
+                except FileNotFoundError:
+                    pass
+
+    def collect(self) -> tuple:
+        """Call metrics summed over all processes, and the sources of each live process by pid."""
+        if not self.directory:
+            return dict(sorted(self._snapshot().items())), {os.getpid(): self.sources()}
+        self.publish()
+        calls, sources = {}, {}
+        for path in glob.glob(os.path.join(self.directory, "metrics-*.json")):
+            try:
+                with open(path) as f:
+                    state = json.load(f)
+            except (OSError, ValueError):  # removed or being replaced meanwhile
+                continue
+            # Calls of exited workers are kept so the counters never go back
+            for name, entry in state["calls"].items():
+                _merge_entry(calls.setdefault(name, {}), entry)
+            if _alive(state["pid"]):
+                sources[state["pid"]] = state["sources"]
+        return dict(sorted(calls.items())), sources
+
+    def timed(self, fn):
+        """Decorate a callback so every call is recorded under its name."""
+        name = fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            rows = [0]
+            token = _rows.set(rows)
+            outcome, output = "error", None
+            measurement = measure(name)
+            try:
+                with measurement:
+                    output = fn(*args, **kwargs)
+                outcome = "ok"
+                return output
+            except PreventUpdate:
+                outcome = "prevented"
+                raise
+            finally:
+                _rows.reset(token)
+                self.observe(
+                    name, measurement.seconds or 0.0, outcome, rows=rows[0],
+                    payload=payload_size(output) if outcome == "ok" and PAYLOAD_REPORT else None,
+                    peak=measurement.peak,
+                )
+        return wrapper
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {}
+            for name, entry in self._calls.items():
+                calls = sum(entry["outcomes"].values())
+                stats[name] = {
+                    "calls": calls,
+                    **entry["outcomes"],
+                    "mean_ms": entry["seconds"] / calls * 1000,
+                }
+                for key in ("rows", "payload_bytes", "peak_bytes"):
+                    if key in entry:
+                        total, count, largest = entry[key]
+                        stats[name][f"mean_{key}"] = total / count
+                        stats[name][f"max_{key}"] = largest
+            return stats
+
+    def prometheus(self, prefix: str = "dashboard", calls: dict = None) -> list:
+        lines = [
+            f"# HELP {prefix}_call_duration_seconds Wall time of callbacks and flow-map steps",
+            f"# TYPE {prefix}_call_duration_seconds histogram",
+        ]
+        if calls is None:
+            calls = dict(sorted(self._snapshot().items()))
+
+        for name, entry in calls.items():
+            label = f'call="{_escape(name)}"'
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), entry["buckets"]):
+                cumulative += count
+                lines.append(f'{prefix}_call_duration_seconds_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f"{prefix}_call_duration_seconds_sum{{{label}}} {entry['seconds']}")
+            lines.append(f"{prefix}_call_duration_seconds_count{{{label}}} {cumulative}")
+
+        lines.append(f"# TYPE {prefix}_calls_total counter")
+        for name, entry in calls.items():
+            for outcome, count in sorted(entry["outcomes"].items()):
+                lines.append(f'{prefix}_calls_total{{call="{_escape(name)}",outcome="{outcome}"}} {count}')
+
+        for key, unit in (("rows", "rows"), ("payload_bytes", "payload_bytes"), ("peak_bytes", "peak_alloc_bytes")):
+            metric = f"{prefix}_call_{unit}"
+            summaries = [(name, entry[key]) for name, entry in calls.items() if key in entry]
+            if not summaries:
+                continue
+            lines.append(f"# TYPE {metric} summary")
+            for name, (total, count, _) in summaries:
+                lines.append(f'{metric}_sum{{call="{_escape(name)}"}} {total}')
+                lines.append(f'{metric}_count{{call="{_escape(name)}"}} {count}')
+            lines.append(f"# TYPE {metric}_max gauge")
+            for name, (_, _, largest) in summaries:
+                lines.append(f'{metric}_max{{call="{_escape(name)}"}} {largest}')
+        return lines
+
+
+def _merge_entry(merged: dict, entry: dict):
+    if not merged:
+        merged.update(outcomes={}, buckets=[0] * len(entry["buckets"]), seconds=0.0)
+    for outcome, count in entry["outcomes"].items():
+        merged["outcomes"][outcome] = merged["outcomes"].get(outcome, 0) + count
+    merged["buckets"] = [a + b for a, b in zip(merged["buckets"], entry["buckets"])]
+    merged["seconds"] += entry["seconds"]
+    for key in ("rows", "payload_bytes", "peak_bytes"):
+        if key in entry:
+            total, count, largest = merged.get(key, (0, 0, 0))
+            merged[key] = (total + entry[key][0], count + entry[key][1], max(largest, entry[key][2]))
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _labels(labels: dict) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+
+def _add_samples(families: dict, stats: dict, labels: dict):
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            for field, sample in value.items():
+                if isinstance(sample, (int, float)):
+                    families.setdefault(field, []).append(
+                        f"{{{_labels({**labels, 'call': key})}}} {float(sample)}"
+                    )
+        elif isinstance(value, (int, float)):
+            families.setdefault(key, []).append(
+                f"{{{_labels(labels)}}} {float(value)}" if labels else f" {float(value)}"
+            )
+
+
+def stats_lines(prefix: str, stats: dict, labels: dict = None) -> list:
+    """Untyped samples for a ``stats()`` dict; nested dicts become ``call`` labels."""
+    # Samples of one metric have to be contiguous in the exposition
+    families = {}
+    _add_samples(families, stats, labels or {})
+    return [f"{prefix}_{field}{sample}" for field, samples in families.items() for sample in samples]
+
+
+def prometheus_text(call_metrics: CallMetrics, prefix: str = "dashboard") -> str:
+    """Exposition of ``call_metrics`` plus the ``stats()`` dicts of its sources.
+
+    With a metrics directory the call metrics are summed over all server
+    processes and the source statistics are labelled by ``worker``.
+    """
+    calls, sources = call_metrics.collect()
+    lines = call_metrics.prometheus(prefix, calls)
+    by_source = {}
+    for pid, stats in sorted(sources.items()):
+        for name, source in stats.items():
+            by_source.setdefault(name, []).append((pid, source))
+    for name, workers in by_source.items():
+        families = {}
+        for pid, source in workers:
+            _add_samples(families, source, {"worker": pid} if call_metrics.directory else {})
+        lines += [f"{prefix}_{name}_{field}{sample}" for field, samples in families.items() for sample in samples]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,227 @@
+"""Month-partitioned rides tables for multi-year history.
+
+    python partitions.py build --out partitions rides_2023.csv rides_2024.csv
+
+writes one preprocessed feather file per month and a ``catalog.json`` listing
+them. With ``RIDES_PARTITIONS=partitions`` the dashboard reads only the months
+a selection needs and keeps recently used ones in memory.
+"""
+import argparse
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import pandas as pd
+
+from cube import RideCube
+from daily_index import DailyIndex
+from dataset import PREPROCESS_VERSION, preprocess
+from ingest import read_rides
+from views import VIEW_CACHE_MB, CachedSelections, FilteredViews, concat_rides, sort_rides
+
+RIDES_PARTITIONS = os.environ.get("RIDES_PARTITIONS", "")
+# Upper bound on the in-memory size of the loaded month partitions
+PARTITION_CACHE_MB = int(os.environ.get("RIDES_PARTITION_CACHE_MB", 512))
+
+CATALOG = "catalog.json"
+
+
+def read_catalog(directory: str) -> dict:
+    with open(os.path.join(directory, CATALOG)) as f:
+        catalog = json.load(f)
+    if catalog["version"] != PREPROCESS_VERSION:
+        raise ValueError(
+            f"Partitions in {directory} were built by preprocessing version {catalog['version']}, "
+            f"this is version {PREPROCESS_VERSION}; rebuild them with partitions.py build"
+        )
+    return catalog
+
+
+def _write_feather(df: pd.DataFrame, path: str):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    df.reset_index(drop=True).to_feather(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def write_partitions(df: pd.DataFrame, directory: str) -> dict:
+    """Add the preprocessed rides ``df`` to the month partitions in ``directory``.
+
+    Months that already have a partition are merged with it.
+    """
+    os.makedirs(directory, exist_ok=True)
+    try:
+        catalog = read_catalog(directory)
+    except FileNotFoundError:
+        catalog = {"version": PREPROCESS_VERSION, "columns": list(df.columns), "partitions": {}}
+
+    df = df[df["Date"].notna()]
+    for period, part in df.groupby(df["Date"].dt.to_period("M"), sort=True):
+        month = str(period)
+        entry = catalog["partitions"].get(month)
+        if entry is not None:
+            existing = pd.read_feather(os.path.join(directory, entry["file"]))
+            part = concat_rides([existing, part])
+        part = sort_rides(part)
+        entry = {
+            "file": f"rides-{month}.feather",
+            "rows": len(part),
+            "start": str(part["Date"].min().date()),
+            "end": str(part["Date"].max().date()),
+        }
+        _write_feather(part, os.path.join(directory, entry["file"]))
+        catalog["partitions"][month] = entry
+
+    # The catalog is written last, so it only lists complete partitions
+    catalog["partitions"] = dict(sorted(catalog["partitions"].items()))
+    tmp_path = os.path.join(directory, f"{CATALOG}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(catalog, f, indent=1)
+    os.replace(tmp_path, os.path.join(directory, CATALOG))
+    return catalog
+
+
+class PartitionStore:
+    """Month partitions listed in a catalog, read on demand.
+
+    Loaded partitions are kept in an LRU bounded by their in-memory size; the
+    most recently used one is kept even if it alone exceeds ``maxbytes``.
+    """
+
+    def __init__(self, directory: str = RIDES_PARTITIONS, maxbytes: int = PARTITION_CACHE_MB * 2**20):
+        self.directory = directory
+        self.catalog = read_catalog(directory)
+        self.maxbytes = maxbytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._loaded = OrderedDict()
+        self._loading = {}  # month -> Future of a partition being read
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def bounds(self) -> tuple:
+        """First and last day with rides, from the catalog."""
+        entries = self.catalog["partitions"].values()
+        if not entries:
+            return None, None
+        return (
+            pd.Timestamp(min(entry["start"] for entry in entries)),
+            pd.Timestamp(max(entry["end"] for entry in entries)),
+        )
+
+    def months(self, start_date, end_date) -> list:
+        """Months whose rides intersect the date range."""
+        start, end = pd.Timestamp(start_date).normalize(), pd.Timestamp(end_date)
+        return [
+            month for month, entry in self.catalog["partitions"].items()
+            if pd.Timestamp(entry["start"]) <= end and pd.Timestamp(entry["end"]) >= start
+        ]
+
+    def read(self, month: str) -> pd.DataFrame:
+        return pd.read_feather(os.path.join(self.directory, self.catalog["partitions"][month]["file"]))
+
+    def views(self, month: str) -> FilteredViews:
+        """Offset tables over the rides of ``month``, loading the partition if needed."""
+        # The file is read outside the lock: other months, loaded or not, are not
+        # held up, and concurrent requests for this month wait for the one read
+        with self._lock:
+            loaded = self._loaded.get(month)
+            if loaded is not None:
+                self._loaded.move_to_end(month)
+                self.hits += 1
+                return loaded[0]
+            loading = self._loading.get(month)
+            if loading is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+                reading = self._loading[month] = Future()
+        if loading is not None:
+            return loading.result()
+
+        try:
+            df = self.read(month)
+            size = int(df.memory_usage(index=True, deep=True).sum())
+            views = FilteredViews(df, maxsize=0)
+        except BaseException as exc:
+            with self._lock:
+                del self._loading[month]
+            reading.set_exception(exc)
+            raise
+        with self._lock:
+            del self._loading[month]
+            self._loaded[month] = (views, size)
+            self._bytes += size
+            while self._bytes > self.maxbytes and len(self._loaded) > 1:
+                _, (_, evicted) = self._loaded.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+        reading.set_result(views)
+        return views
+
+    def aggregates(self) -> tuple:
+        """RideCube and DailyIndex over every partition, reading one month at a time."""
+        cubes, indexes = [], []
+        for month in self.catalog["partitions"]:
+            df = self.read(month)
+            cubes.append(RideCube(df))
+            indexes.append(DailyIndex(df))
+        if not cubes:
+            raise ValueError(f"No partitions in {self.directory}")
+        return RideCube.merge(cubes), DailyIndex.merge(indexes)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "partitions": len(self.catalog["partitions"]),
+                "loaded": len(self._loaded),
+                "loaded_bytes": self._bytes,
+                "maxbytes": self.maxbytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class PartitionedViews(CachedSelections):
+    """Selections over a ``PartitionStore`` that read only the months they cover."""
+
+    def __init__(self, store: PartitionStore, maxsize: int = 16, maxbytes: int = VIEW_CACHE_MB * 2**20,
+                 columns=None):
+        super().__init__(maxsize, maxbytes, columns)
+        self.store = store
+
+    def bounds(self) -> tuple:
+        return self.store.bounds()
+
+    def _select(self, start, end, vehicle_types, columns=None) -> pd.DataFrame:
+        parts = [
+            self.store.views(month).select(start, end, vehicle_types, columns)
+            for month in self.store.months(start, end)
+        ]
+        parts = [part for part in parts if len(part)]
+        if not parts:
+            return pd.DataFrame(columns=columns if columns is not None else self.store.catalog["columns"])
+        if len(parts) == 1:
+            return parts[0]
+        return concat_rides(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="preprocess CSV exports into month partitions")
+    build.add_argument("paths", nargs="+")
+    build.add_argument("--out", default=RIDES_PARTITIONS or "partitions")
+    args = parser.parse_args()
+
+    for path in args.paths:
+        # One export in memory at a time
+        catalog = write_partitions(preprocess(read_rides(path)), args.out)
+        print(f"Added {path} to {args.out} ({len(catalog['partitions'])} months)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import base64
+import functools
+import gzip
+import logging
+import os
+import threading
+
+import numpy as np
+import plotly.io as pio
+
+logger = logging.getLogger(__name__)
+
+# Measuring the plain-JSON size re-serialises every figure, so it is opt-in
+PAYLOAD_REPORT = os.environ.get("PAYLOAD_REPORT", "") not in ("", "0")
+
+# Typed-array dtypes understood by plotly.js, smallest first
+_INT_DTYPES = ["i1", "u1", "i2", "u2", "i4", "u4"]
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _decode(value: dict) -> np.ndarray:
+    array = np.frombuffer(base64.b64decode(value["bdata"]), dtype=value["dtype"])
+    if "shape" in value:
+        array = array.reshape([int(n) for n in str(value["shape"]).split(",")])
+    return array
+
+
+def _compact(array: np.ndarray) -> np.ndarray:
+    if array.dtype.kind in "iu":
+        if array.size == 0:
+            return array.astype("i1")
+        lo, hi = array.min(), array.max()
+        for dtype in _INT_DTYPES:
+            info = np.iinfo(dtype)
+            if info.min <= lo and hi <= info.max:
+                return array.astype(dtype)
+        return array.astype("f8")
+    single = array.astype("f4")
+    if np.array_equal(single, array, equal_nan=True):
+        return single
+    return array.astype("f8")
+
+
+def encode_array(array: np.ndarray) -> dict:
+    array = np.ascontiguousarray(_compact(array))
+    encoded = {
+        "dtype": array.dtype.str.lstrip("<|="),
+        "bdata": base64.b64encode(array.tobytes()).decode(),
+    }
+    if array.ndim > 1:
+        encoded["shape"] = ", ".join(str(n) for n in array.shape)
+    return encoded
+
+
+def _encode(value):
+    if isinstance(value, dict):
+        if "bdata" in value and "dtype" in value:
+            return encode_array(_decode(value))
+        return {key: _encode(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(item) for item in value]
+    if isinstance(value, np.ndarray) and value.dtype.kind in "iuf":
+        return encode_array(value)
+    return value
+
+
+def _plain(value):
+    if isinstance(value, dict):
+        if "bdata" in value and "dtype" in value:
+            return _decode(value).tolist()
+        return {key: _plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return value
+
+
+def encode_figure(fig) -> dict:
+    """Figure dict whose numeric trace arrays are base64 typed arrays.
+
+    Only trace data is encoded; layout values such as axis ranges must stay
+    plain JSON for plotly.js.
+    """
+    fig_dict = fig.to_plotly_json() if hasattr(fig, "to_plotly_json") else dict(fig)
+    return {**fig_dict, "data": _encode(fig_dict.get("data", []))}
+
+
+def _record(name: str, encoded: dict):
+    encoded_json = pio.json.to_json_plotly(encoded).encode()
+    sizes = {
+        "plain": len(pio.json.to_json_plotly(_plain(encoded))),
+        "binary": len(encoded_json),
+        "gzip": len(gzip.compress(encoded_json, compresslevel=6)),
+    }
+    with _stats_lock:
+        entry = _stats.setdefault(name, {"calls": 0, "plain": 0, "binary": 0, "gzip": 0})
+        entry["calls"] += 1
+        for key, size in sizes.items():
+            entry[key] += size
+    logger.info(
+        "%s payload: %d B plain JSON, %d B binary, %d B gzipped",
+        name, sizes["plain"], sizes["binary"], sizes["gzip"],
+    )
+
+
+def binary_figure(fn):
+    """Decorate a figure callback so it returns a typed-array encoded figure dict."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        fig = fn(*args, **kwargs)
+        encoded = encode_figure(fig)
+        if PAYLOAD_REPORT:
+            _record(fn.__name__, encoded)
+        return encoded
+    return wrapper
+
+
+def payload_stats() -> dict:
+    with _stats_lock:
+        return {name: dict(entry) for name, entry in _stats.items()}
+
+
+def payload_report() -> str:
+    lines = [f"{'callback':<32} {'calls':>6} {'plain JSON':>12} {'binary':>12} {'gzipped':>12}"]
+    for name, entry in sorted(payload_stats().items()):
+        calls = entry["calls"]
+        lines.append(
+            f"{name:<32} {calls:>6} {entry['plain'] // calls:>12,} "
+            f"{entry['binary'] // calls:>12,} {entry['gzip'] // calls:>12,}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,134 @@
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+
+from metrics import measure
+from utils import flows_to_gdf, render_flow_map
+
+logger = logging.getLogger(__name__)
+
+
+def _render(flows: pd.DataFrame) -> tuple:
+    # Timed where the work happens, which may be a pool process; the caller
+    # records the measurements
+    with measure("flows_to_gdf") as built:
+        gdf = flows_to_gdf(flows)
+    with measure("render_flow_map") as rendered:
+        html_map = render_flow_map(gdf)
+    return html_map, [
+        (built.name, built.seconds, built.peak, None),
+        (rendered.name, rendered.seconds, rendered.peak, len(html_map.encode())),
+    ]
+
+
+def _warm_up():
+    # Build the persistent figure before the first real request arrives
+    _render(pd.DataFrame({"Pickup region": [], "Drop region": [], "volume": []}))
+
+
+def _context():
+    # Pool processes are started from a forkserver (spawn where that is not
+    # available) rather than forked from the threaded web server, which could
+    # hand them locks held by other request threads
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn")
+    context = multiprocessing.get_context("forkserver")
+    # utils imports the plotting stack lazily; preloading it here lets every
+    # pool process fork with it already imported
+    context.set_forkserver_preload([__name__, "geopandas", "matplotlib.figure"])
+    return context
+
+
+class FlowMapRenderer:
+    """Renders flow maps in a bounded process pool, dropping superseded requests.
+
+    Each session has at most one render it cares about: submitting a new one
+    cancels the previous render if it has not started yet, and a render that
+    finishes after being superseded is discarded. With ``processes=0`` maps
+    are rendered in the calling thread. Sessions are tracked per process, so
+    requests of one page served by different workers do not supersede each other.
+    """
+
+    def __init__(self, processes: int = 2, metrics=None):
+        self.processes = processes
+        self.metrics = metrics
+        self.cancelled = 0
+        self.discarded = 0
+        self._latest = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        # Started on first use, so a preloading master never owns pool processes
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                self.processes, mp_context=_context(), initializer=_warm_up
+            )
+        return self._executor
+
+    def render(self, flows: pd.DataFrame, session=None):
+        """HTML flow map for ``flows``, or None if a newer request of ``session`` superseded it."""
+        if not self.processes:
+            return self._result(flows, _render(flows))
+
+        with self._lock:
+            previous = self._latest.get(session) if session is not None else None
+            if previous is not None and previous.cancel():
+                self.cancelled += 1
+            executor = self._pool()
+            try:
+                future = executor.submit(_render, flows)
+            except BrokenProcessPool:  # a pool process died while the pool was idle
+                logger.warning("Flow-map render pool broke while idle, restarting it")
+                self._executor = None
+                executor = self._pool()
+                future = executor.submit(_render, flows)
+            if session is not None:
+                self._latest[session] = future
+
+        try:
+            html_map = self._result(flows, future.result())
+        except CancelledError:
+            return None
+        except BrokenProcessPool:
+            logger.exception("Flow-map render pool failed, restarting it")
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+                if session is not None and self._latest.get(session) is future:
+                    del self._latest[session]
+            return self._result(flows, _render(flows))
+
+        with self._lock:
+            if session is not None:
+                if self._latest.get(session) is not future:
+                    self.discarded += 1
+                    return None
+                del self._latest[session]
+        return html_map
+
+    def _result(self, flows: pd.DataFrame, rendered: tuple) -> str:
+        html_map, measurements = rendered
+        if self.metrics is not None:
+            for name, seconds, peak, payload in measurements:
+                self.metrics.observe(name, seconds, rows=len(flows), payload=payload, peak=peak)
+        return html_map
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "processes": self.processes,
+                "in_flight": len(self._latest),
+                "cancelled": self.cancelled,
+                "discarded": self.discarded,
+            }
@@ -0,0 +1,104 @@
+"""Production launcher: load the dataset once, then fork gunicorn workers.
+
+    python serve.py --workers 4 --bind 0.0.0.0:8050
+
+See the "Production deployment" section of README.md for the memory footprint
+per worker.
+"""
+import argparse
+import gc
+import glob
+import logging
+import os
+import tempfile
+
+from gunicorn.app.base import BaseApplication
+
+from wsgi import create_app
+
+logger = logging.getLogger("serve")
+
+
+def process_memory(pid="self") -> dict:
+    """Resident, proportional and private memory of a process in MiB (Linux only)."""
+    memory = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("Rss", "Pss", "Private_Clean", "Private_Dirty", "Shared_Clean", "Shared_Dirty"):
+                memory[key] = int(value.split()[0]) / 1024
+    memory["Private"] = memory.pop("Private_Clean", 0) + memory.pop("Private_Dirty", 0)
+    memory["Shared"] = memory.pop("Shared_Clean", 0) + memory.pop("Shared_Dirty", 0)
+    return memory
+
+
+def _log_memory(label, pid="self"):
+    try:
+        memory = process_memory(pid)
+    except OSError:
+        return
+    logger.info(
+        "%s memory: RSS %.0f MiB, PSS %.0f MiB, private %.0f MiB, shared %.0f MiB",
+        label, memory["Rss"], memory["Pss"], memory["Private"], memory["Shared"],
+    )
+
+
+def post_worker_init(worker):
+    _log_memory(f"worker {worker.pid}")
+
+
+def worker_exit(server, worker):
+    _log_memory(f"worker {worker.pid} at exit")
+
+
+class DashboardServer(BaseApplication):
+    def __init__(self, application, options):
+        self.application = application
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        return self.application
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bind", default="0.0.0.0:8050")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--timeout", type=int, default=120)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(process)d] %(message)s")
+
+    # Workers publish their metrics here, so /metrics reports all of them
+    # whichever worker answers; read by metrics.py when the app is imported
+    metrics_dir = os.environ.setdefault("METRICS_DIR", tempfile.mkdtemp(prefix="dashboard-metrics-"))
+    os.makedirs(metrics_dir, exist_ok=True)
+    for stale in glob.glob(os.path.join(metrics_dir, "metrics-*.json")):
+        os.remove(stale)
+
+    server = create_app()
+    _log_memory("master after preload")
+    # Move everything allocated so far out of the collector's reach, so
+    # collections in the workers do not touch (and un-share) those pages
+    gc.freeze()
+
+    DashboardServer(server, {
+        "bind": args.bind,
+        "workers": args.workers,
+        "worker_class": "gthread",
+        "threads": args.threads,
+        "timeout": args.timeout,
+        "preload_app": True,
+        "post_worker_init": post_worker_init,
+        "worker_exit": worker_exit,
+    }).run()
+
+
+if __name__ == "__main__":
+    main()
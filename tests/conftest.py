@@ -0,0 +1,73 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from views import sort_rides  # noqa: E402
+
+VEHICLE_TYPES = ["Auto", "Bike", "Go Mini", "Go Sedan", "Premier Sedan", "eBike"]
+STATUSES = ["Cancelled by Customer", "Completed", "Incomplete", "No Driver Found"]
+PAYMENT_METHODS = ["Cash", "Credit Card", "UPI", "Uber Wallet"]
+REGIONS = ["CENTRAL", "NEW DELHI", "OUTSIDE", "SOUTH", "UNKNOWN"]
+
+# (start date, end date, vehicle types) covering whole, partial, single-day,
+# empty and out-of-range selections
+SELECTIONS = [
+    ("2024-01-01", "2024-03-31", VEHICLE_TYPES),
+    ("2024-01-10", "2024-02-20", ["Auto", "Bike"]),
+    ("2024-02-01", "2024-02-01", ["Go Mini", "eBike", "Premier Sedan"]),
+    ("2024-01-15", "2024-03-10", ["Auto", "Go Sedan", "eBike"]),
+    ("2023-12-01", "2024-01-05", ["Bike"]),
+    ("2024-03-20", "2024-05-01", VEHICLE_TYPES[1:]),
+    ("2024-01-01", "2024-03-31", []),
+    ("2025-01-01", "2025-01-31", VEHICLE_TYPES),
+]
+
+
+def synthetic_rides(n: int = 3000, seed: int = 0) -> pd.DataFrame:
+    """Preprocessed-looking rides over the first quarter of 2024, sorted by ``sort_rides``.
+
+    A few rides lack a vehicle type, payment method or booking value, as in
+    the export.
+    """
+    rng = np.random.default_rng(seed)
+
+    def categorical(values, missing=0.0):
+        picked = np.asarray(values, dtype=object)[rng.integers(len(values), size=n)]
+        picked[rng.random(n) < missing] = None
+        return pd.Categorical(picked, categories=values)
+
+    value = rng.gamma(2.0, 250.0, size=n).round(1).astype(np.float32)
+    value[rng.random(n) < 0.1] = np.nan
+    df = pd.DataFrame({
+        "Booking ID": np.arange(n),
+        "Date": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(91, size=n), unit="D"),
+        "Hour": rng.integers(24, size=n).astype(np.int8),
+        "Booking Status": categorical(STATUSES),
+        "Vehicle Type": categorical(VEHICLE_TYPES, missing=0.02),
+        "Payment Method": categorical(PAYMENT_METHODS, missing=0.1),
+        "Booking Value": value,
+        "Ride Distance": rng.uniform(1, 50, size=n).astype(np.float32),
+        "Pickup region": categorical(REGIONS),
+        "Drop region": categorical(REGIONS),
+    })
+    return sort_rides(df)
+
+
+def selected(df: pd.DataFrame, start_date, end_date, vehicle_types) -> pd.DataFrame:
+    """Rides of the selection, found with a plain boolean mask."""
+    mask = (
+        (df["Date"] >= pd.Timestamp(start_date))
+        & (df["Date"] <= pd.Timestamp(end_date))
+        & df["Vehicle Type"].isin(vehicle_types)
+    )
+    return df[mask]
+
+
+@pytest.fixture(scope="session")
+def rides() -> pd.DataFrame:
+    return synthetic_rides()
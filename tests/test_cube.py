@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import SELECTIONS, selected, synthetic_rides
+
+from cube import _ARRAY_AXES, RideCube
+from views import concat_rides
+
+
+def observed_counts(series: pd.Series) -> dict:
+    counts = series.value_counts()
+    return {key: int(count) for key, count in counts[counts > 0].items()}
+
+
+@pytest.mark.parametrize("selection", SELECTIONS)
+def test_vehicle_type_counts_match_value_counts(rides, selection):
+    expected = observed_counts(selected(rides, *selection)["Vehicle Type"])
+    result = RideCube(rides).by_vehicle_type(*selection)
+    assert dict(zip(result["Vehicle Type"], result["Count"].tolist())) == expected
+
+
+@pytest.mark.parametrize("selection", SELECTIONS)
+def test_payment_counts_and_revenue_match_groupby(rides, selection):
+    rows = selected(rides, *selection)
+    result = RideCube(rides).by_payment_method(*selection).set_index("Payment Method")
+
+    assert result["Count"].to_dict() == observed_counts(rows["Payment Method"])
+    revenue = rows["Booking Value"].astype("float64").groupby(rows["Payment Method"], observed=True).sum()
+    np.testing.assert_allclose(result["Total_Revenue"], revenue[result.index], rtol=1e-12)
+
+
+@pytest.mark.parametrize("selection", SELECTIONS)
+def test_completion_by_hour_matches_groupby(rides, selection):
+    rows = selected(rides, *selection)
+    completed = (rows["Booking Status"] == "Completed").groupby(rows["Hour"]).agg(["sum", "size"])
+    result = RideCube(rides).by_completion("Hour", *selection).set_index("Hour")
+
+    assert result["completed"].to_dict() == completed["sum"].to_dict()
+    assert (result["completed"] + result["not_completed"]).to_dict() == completed["size"].to_dict()
+
+
+@pytest.mark.parametrize("selection", SELECTIONS)
+def test_flows_match_groupby(rides, selection):
+    rows = selected(rides, *selection)
+    expected = rows.groupby(["Pickup region", "Drop region"], observed=True).size()
+    result = RideCube(rides).flows(*selection).set_index(["Pickup region", "Drop region"])["volume"]
+    assert result.to_dict() == expected[expected > 0].to_dict()
+
+
+def test_merge_matches_cube_of_concatenation():
+    first = synthetic_rides(1500, seed=1)
+    # Overlapping dates, a vehicle type and a payment method only the second
+    # batch has
+    second = synthetic_rides(1000, seed=2)
+    second["Vehicle Type"] = second["Vehicle Type"].cat.add_categories("Uber XL")
+    second.loc[second.index[::7], "Vehicle Type"] = "Uber XL"
+    second["Payment Method"] = second["Payment Method"].cat.add_categories("Debit Card")
+    second.loc[second.index[::5], "Payment Method"] = "Debit Card"
+
+    merged = RideCube.merge([RideCube(first), RideCube(second)])
+    whole = RideCube(concat_rides([first, second]))
+
+    for axis in ("dates", "vehicle_types", "statuses", "hours", "payment_methods", "regions"):
+        np.testing.assert_array_equal(getattr(merged, axis), getattr(whole, axis))
+    for name in _ARRAY_AXES:
+        np.testing.assert_allclose(getattr(merged, name), getattr(whole, name), rtol=1e-12)
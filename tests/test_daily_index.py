@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+from conftest import PAYMENT_METHODS, SELECTIONS, selected, synthetic_rides
+
+from daily_index import DailyIndex
+from views import FilteredViews, concat_rides
+
+METRICS = ["rides", "completed", "revenue", *(f"payment:{method}" for method in PAYMENT_METHODS)]
+
+
+def masked_sum(rows, metric):
+    if metric == "rides":
+        return len(rows)
+    if metric == "completed":
+        return int((rows["Booking Status"] == "Completed").sum())
+    if metric == "revenue":
+        return float(rows["Booking Value"].astype("float64").sum())
+    return int((rows["Payment Method"] == metric.removeprefix("payment:")).sum())
+
+
+@pytest.mark.parametrize("selection", SELECTIONS)
+@pytest.mark.parametrize("metric", METRICS)
+def test_range_sum_matches_masked_sum(rides, selection, metric):
+    expected = masked_sum(selected(rides, *selection), metric)
+    assert DailyIndex(rides).range_sum(metric, *selection) == pytest.approx(expected, rel=1e-12)
+
+
+def test_partial_days_are_excluded(rides):
+    # Only whole days inside the range count
+    index = DailyIndex(rides)
+    vehicles = ["Auto", "Bike"]
+    whole = index.range_sum("rides", "2024-02-02", "2024-02-09", vehicles)
+    assert index.range_sum("rides", "2024-02-01 12:00", "2024-02-09 23:00", vehicles) == whole
+
+
+def test_unindexed_metric_is_summed_from_rows(rides):
+    views = FilteredViews(rides)
+    selection = SELECTIONS[1]
+    expected = float(selected(rides, *selection)["Ride Distance"].astype("float64").sum())
+    result = DailyIndex(rides).range_sum("Ride Distance", *selection, rows=views.select)
+    assert result == pytest.approx(expected, rel=1e-12)
+    with pytest.raises(KeyError):
+        DailyIndex(rides).range_sum("Ride Distance", *selection)
+
+
+def test_merge_matches_index_of_concatenation():
+    first = synthetic_rides(1500, seed=1)
+    second = synthetic_rides(1000, seed=2)
+    # The second batch extends past the first one's last day
+    second["Date"] = second["Date"] + np.timedelta64(30, "D")
+
+    merged = DailyIndex.merge([DailyIndex(first), DailyIndex(second)])
+    whole = DailyIndex(concat_rides([first, second]))
+
+    assert merged.first_day == whole.first_day
+    assert merged.n_days == whole.n_days
+    np.testing.assert_array_equal(merged.vehicle_types, whole.vehicle_types)
+    assert merged.metrics == whole.metrics
+    for metric in whole.metrics:
+        np.testing.assert_allclose(merged.sums[metric], whole.sums[metric], rtol=1e-12)
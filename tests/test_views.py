@@ -0,0 +1,52 @@
+import pandas as pd
+import pytest
+from conftest import SELECTIONS, selected, synthetic_rides
+
+from views import FilteredViews, concat_rides, sort_rides
+
+
+def assert_same_rows(result: pd.DataFrame, expected: pd.DataFrame):
+    pd.testing.assert_frame_equal(result.reset_index(drop=True), expected.reset_index(drop=True))
+
+
+@pytest.mark.parametrize("selection", SELECTIONS)
+def test_selection_matches_boolean_mask(rides, selection):
+    # The sorted layout keeps the rows in table order
+    assert_same_rows(FilteredViews(rides).get(*selection), selected(rides, *selection))
+
+
+@pytest.mark.parametrize("selection", SELECTIONS)
+def test_cached_columns_match_boolean_mask(rides, selection):
+    columns = ["Ride Distance", "Booking Value"]
+    views = FilteredViews(rides, columns=columns)
+    assert_same_rows(views.get(*selection), selected(rides, *selection)[columns])
+    # A second lookup is served from the cache
+    assert_same_rows(views.get(*selection), selected(rides, *selection)[columns])
+    assert views.stats()["hits"] == 1
+    assert list(views.select(*selection).columns) == list(rides.columns)
+
+
+def test_cache_is_bounded_by_size(rides):
+    views = FilteredViews(rides, maxbytes=1)
+    for selection in SELECTIONS[:4]:
+        views.get(*selection)
+    stats = views.stats()
+    # The most recent selection is kept even though it exceeds the bound
+    assert stats["size"] == 1
+    assert stats["evictions"] == 3
+
+
+@pytest.mark.parametrize("selection", SELECTIONS)
+def test_appended_rows_match_boolean_mask(selection):
+    base, rows = synthetic_rides(1500, seed=1), synthetic_rides(500, seed=2)
+    rows["Booking ID"] += len(base)
+    views = FilteredViews(base).append(rows.iloc[:200]).append(rows.iloc[200:])
+
+    expected = selected(sort_rides(concat_rides([base, rows])), *selection)
+    result = views.get(*selection)
+    assert_same_rows(result.sort_values("Booking ID"), expected.sort_values("Booking ID"))
+
+
+def test_unsorted_rides_are_rejected(rides):
+    with pytest.raises(ValueError):
+        FilteredViews(rides.iloc[::-1])
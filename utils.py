@@ -1,10 +1,22 @@
+from __future__ import annotations
+
+import numpy as np
 import pandas as pd
 import base64
+import functools
+import hashlib
 import io
-from shapely.geometry import LineString
-import matplotlib.pyplot as plt
-import geopandas as gpd
-import matplotlib as mpl
+import logging
+import os
+import threading
+from typing import TYPE_CHECKING
+
+# The geo and plotting stack is imported on first use, so tools that only map
+# locations to regions do not pay for it
+if TYPE_CHECKING:
+    import geopandas as gpd
+
+logger = logging.getLogger(__name__)
 
 location_to_district = {
     'AIIMS': 'SOUTH',
@@ -186,109 +198,427 @@ location_to_district = {
 }
 
 DISTRICT_SHP = "input/DISTRICT_BOUNDARY.shp"
-gdf = gpd.read_file(DISTRICT_SHP)
-gdf["District"] = gdf["District"].str.replace(">", "").str.strip()
-gdf["STATE"]    = gdf["STATE"].str.replace(">", "").str.strip()
-DELHI = gdf[gdf["STATE"] == "DELHI"].to_crs(epsg=32644).copy()
-DELHI["centroid"] = DELHI.geometry.centroid
+# Cleaned and reprojected DELHI districts, written by input/build_districts.py
+DISTRICT_ARTIFACT = "input/delhi_districts.npz"
+# Simplification tolerances (metres) of the precomputed basemap levels
+SIMPLIFY_TOLERANCES = (5, 10, 20, 50, 100)
+
+
+def load_districts(path: str = DISTRICT_SHP) -> gpd.GeoDataFrame:
+    import geopandas as gpd
+
+    gdf = gpd.read_file(path)
+    gdf["District"] = gdf["District"].str.replace(">", "").str.strip()
+    gdf["STATE"]    = gdf["STATE"].str.replace(">", "").str.strip()
+    delhi = gdf[gdf["STATE"] == "DELHI"].to_crs(epsg=32644).copy()
+    delhi["centroid"] = delhi.geometry.centroid
+    return delhi
+
+
+def simplify_districts(geometry: np.ndarray, tolerances=SIMPLIFY_TOLERANCES) -> list:
+    """(tolerance, max deviation, geometries) per level, finest first.
+
+    Coverage simplification keeps shared borders shared, so neighbouring
+    districts never gap or overlap. Shapely before 2.1 lacks it; there each
+    district is simplified on its own, which can open slivers along shared
+    borders. The deviation is the largest Hausdorff distance of any simplified
+    district from the original.
+    """
+    import shapely
+
+    levels = []
+    for tolerance in tolerances:
+        if hasattr(shapely, "coverage_simplify"):
+            simplified = shapely.coverage_simplify(geometry, tolerance)
+        else:
+            simplified = shapely.simplify(geometry, tolerance, preserve_topology=True)
+        deviation = float(shapely.hausdorff_distance(geometry, simplified).max())
+        levels.append((tolerance, deviation, simplified))
+    return levels
+
+
+def _source_digest(path: str = DISTRICT_SHP):
+    sha1 = hashlib.sha1()
+    try:
+        for ext in (".shp", ".dbf"):
+            with open(os.path.splitext(path)[0] + ext, "rb") as f:
+                sha1.update(f.read())
+    except OSError:
+        return None
+    return sha1.hexdigest()
+
+
+def _pack_wkb(geometry: np.ndarray):
+    import shapely
+
+    wkb = shapely.to_wkb(geometry)
+    return np.frombuffer(b"".join(wkb), dtype=np.uint8), np.cumsum([0] + [len(g) for g in wkb])
+
+
+def _unpack_wkb(wkb: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    import shapely
+
+    wkb = wkb.tobytes()
+    return shapely.from_wkb([wkb[a:b] for a, b in zip(offsets[:-1], offsets[1:])])
+
+
+def write_district_artifact(delhi: gpd.GeoDataFrame, path: str = DISTRICT_ARTIFACT,
+                            source: str = DISTRICT_SHP):
+    import shapely
+
+    arrays = {}
+    arrays["wkb"], arrays["wkb_offsets"] = _pack_wkb(delhi.geometry.values)
+    levels = simplify_districts(delhi.geometry.values)
+    for tolerance, _, simplified in levels:
+        arrays[f"wkb_{tolerance}"], arrays[f"wkb_offsets_{tolerance}"] = _pack_wkb(simplified)
+
+    np.savez_compressed(
+        path,
+        district=delhi["District"].to_numpy(dtype=str),
+        centroid=shapely.get_coordinates(delhi["centroid"].values),
+        crs=np.array(delhi.crs.to_wkt()),
+        source=np.array(_source_digest(source) or ""),
+        tolerance=np.array([tolerance for tolerance, _, _ in levels]),
+        deviation=np.array([deviation for _, deviation, _ in levels]),
+        **arrays,
+    )
+
+
+def read_district_artifact(path: str = DISTRICT_ARTIFACT, source: str = DISTRICT_SHP):
+    """DELHI districts and their simplified levels from the artifact.
+
+    Returns None if the artifact was built from another shapefile.
+    """
+    import geopandas as gpd
+    import shapely
+
+    with np.load(path) as data:
+        digest = _source_digest(source)
+        if digest is not None and str(data["source"]) != digest:
+            return None
+        crs = str(data["crs"])
+        delhi = gpd.GeoDataFrame(
+            {"District": data["district"].astype(object)},
+            geometry=_unpack_wkb(data["wkb"], data["wkb_offsets"]),
+            crs=crs,
+        )
+        delhi["centroid"] = gpd.GeoSeries(shapely.points(data["centroid"]), crs=crs)
+        levels = [
+            (int(tolerance), float(deviation),
+             _unpack_wkb(data[f"wkb_{tolerance}"], data[f"wkb_offsets_{tolerance}"]))
+            for tolerance, deviation in zip(data["tolerance"], data["deviation"])
+        ]
+    return delhi, levels
+
+
+def _prepared(geometry: np.ndarray) -> np.ndarray:
+    import shapely
+
+    geometry = geometry.copy()
+    shapely.prepare(geometry)
+    return geometry
+
+
+@functools.lru_cache(maxsize=None)
+def _geo() -> dict:
+    loaded = None
+    if os.path.exists(DISTRICT_ARTIFACT):
+        loaded = read_district_artifact()
+        if loaded is None:
+            logger.warning("%s is stale, run input/build_districts.py", DISTRICT_ARTIFACT)
+    if loaded is None:
+        delhi = load_districts()
+        loaded = delhi, simplify_districts(delhi.geometry.values)
+    delhi, levels = loaded
+
+    import shapely
+
+    # District-pair flow lines, built once: PAIR_LINES[i, j] joins the centroids
+    # of DISTRICTS[i] and DISTRICTS[j]
+    districts = np.sort(delhi["District"].to_numpy(dtype=object))
+    district_xy = shapely.get_coordinates(delhi.set_index("District")["centroid"].loc[districts].values)
+    pair_lines = shapely.linestrings(
+        np.stack([
+            np.repeat(district_xy, len(districts), axis=0),
+            np.tile(district_xy, (len(districts), 1)),
+        ], axis=1)
+    ).reshape(len(districts), len(districts))
+    return {
+        "DELHI": delhi,
+        "DISTRICTS": districts,
+        "PAIR_LINES": pair_lines,
+        "levels": levels,
+        # Spatial index over the full-resolution districts for point lookups
+        "tree": shapely.STRtree(_prepared(delhi.geometry.values)),
+    }
+
+
+def basemap_districts(metres_per_pixel: float) -> gpd.GeoDataFrame:
+    """DELHI with the coarsest precomputed geometry that stays within half a pixel of the original."""
+    import geopandas as gpd
+
+    geo = _geo()
+    delhi = geo["DELHI"]
+    geometry = delhi.geometry.values
+    for _, deviation, simplified in geo["levels"]:
+        if deviation <= metres_per_pixel / 2:
+            geometry = simplified
+    return delhi.assign(geometry=gpd.GeoSeries(geometry, index=delhi.index, crs=delhi.crs))
+
+
+def __getattr__(name):
+    # DELHI, DISTRICTS and PAIR_LINES are loaded on first access
+    if name in ("DELHI", "DISTRICTS", "PAIR_LINES"):
+        return _geo()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 def get_admin_region(place):
     return location_to_district.get(place.title().strip(), "UNKNOWN")
 
+def point_regions(lon, lat) -> np.ndarray:
+    """District containing each WGS84 point, or "OUTSIDE" for points outside Delhi."""
+    import shapely
+    from pyproj import Transformer
+
+    geo = _geo()
+    x, y = Transformer.from_crs("EPSG:4326", geo["DELHI"].crs, always_xy=True).transform(
+        np.asarray(lon, dtype=np.float64), np.asarray(lat, dtype=np.float64)
+    )
+    # Bounding-box candidates from the index, then exact tests against the
+    # prepared district polygons
+    point, district = geo["tree"].query(shapely.points(x, y))
+    inside = shapely.intersects_xy(geo["tree"].geometries[district], x[point], y[point])
+    point, district = point[inside], district[inside]
+    # A point on a shared border keeps the first district that contains it
+    point, first = np.unique(point, return_index=True)
+
+    regions = np.full(len(x), "OUTSIDE", dtype=object)
+    regions[point] = geo["DELHI"]["District"].to_numpy(dtype=object)[district[first]]
+    return regions
+
+# Region of every location seen so far; each distinct location is resolved once
+# per version of the geocode store
+_location_regions = {}
+_store_digest = None
+
+def location_regions(places) -> list:
+    """Region of each place name.
+
+    Places with coordinates in the geocode store are joined against the DELHI
+    districts; the others fall back to ``location_to_district``.
+    """
+    global _store_digest
+    from geocode_store import GeocodeStore
+
+    store = GeocodeStore()
+    digest = store.digest()
+    if digest != _store_digest:
+        _location_regions.clear()
+        _store_digest = digest
+    missing = [place for place in dict.fromkeys(places) if place not in _location_regions]
+    if missing:
+        _location_regions.update(_resolve_regions(store, missing))
+    return [_location_regions[place] for place in places]
+
+def _resolve_regions(store, places) -> dict:
+    regions = {place: get_admin_region(place) for place in places}
+    found = store.lookup(places) if len(store) else ()
+    # The district geometries are only loaded when some place has coordinates
+    if len(found):
+        import shapely
+
+        lon, lat = shapely.get_coordinates(shapely.point_on_surface(found.geometry.values)).T
+        regions.update(zip(found.index, point_regions(lon, lat)))
+    return regions
+
 def transform_column(series: pd.Series) -> pd.Series:
-    return series.apply(get_admin_region)
+    # Map each distinct location once and broadcast through the category codes
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype("category")
+    regions = location_regions(list(series.cat.categories))
+    region_names, region_of_place = np.unique(np.array(regions, dtype=object), return_inverse=True)
 
-def build_flow_gdf(df_filtered: pd.DataFrame) -> gpd.GeoDataFrame:
-    if df_filtered.empty:
-        return gpd.GeoDataFrame(
-            columns=["Pickup region", "Drop region", "volume", "geometry"],
-            crs=DELHI.crs,
-            geometry=[],
-        )
-    flows = (
-        df_filtered
-        .groupby(["Pickup region", "Drop region"])
-        .size()
-        .reset_index(name="volume")
+    codes = series.cat.codes.to_numpy()
+    region_codes = np.where(codes >= 0, region_of_place[codes], -1)
+    return pd.Series(
+        pd.Categorical.from_codes(region_codes, categories=region_names),
+        index=series.index,
+        name=series.name,
     )
-    valid_names = set(DELHI["District"])
-    flows = flows[
-        flows["Pickup region"].isin(valid_names)
-        & flows["Drop region"].isin(valid_names)
-    ].reset_index(drop=True)
 
-    lookup = DELHI.set_index("District")["centroid"]
+def district_codes(regions) -> np.ndarray:
+    # Index into DISTRICTS, or -1 for regions outside Delhi
+    return pd.Categorical(regions, categories=_geo()["DISTRICTS"]).codes.astype(np.int64)
 
-    def make_line(row):
-        origin_pt = lookup[row["Pickup region"]]
-        dest_pt = lookup[row["Drop region"]]
-        return LineString([origin_pt, dest_pt])
 
-    flows["geometry"] = flows.apply(make_line, axis=1)
-    return gpd.GeoDataFrame(flows, geometry="geometry", crs=DELHI.crs)
+def od_matrix(pickup, drop, weights=None) -> np.ndarray:
+    n = len(_geo()["DISTRICTS"])
+    origin, dest = district_codes(pickup), district_codes(drop)
+    valid = (origin >= 0) & (dest >= 0)
+    if weights is not None:
+        weights = np.asarray(weights, dtype=np.float64)[valid]
+    counts = np.bincount(origin[valid] * n + dest[valid], weights=weights, minlength=n * n)
+    return counts.astype(np.int64).reshape(n, n)
 
 
-def render_flow_map(gdf_flows: gpd.GeoDataFrame) -> str:
-    fig, ax = plt.subplots(1, 1, figsize=(12, 10))
+def od_flows_gdf(matrix: np.ndarray) -> gpd.GeoDataFrame:
+    import geopandas as gpd
 
-    DELHI.plot(
-        ax=ax,
-        edgecolor="gray",
-        facecolor="#f0f0f0",
-        linewidth=0.8,
+    geo = _geo()
+    origin, dest = np.nonzero(matrix)
+    return gpd.GeoDataFrame(
+        {
+            "Pickup region": geo["DISTRICTS"][origin],
+            "Drop region": geo["DISTRICTS"][dest],
+            "volume": matrix[origin, dest],
+        },
+        geometry=geo["PAIR_LINES"][origin, dest],
+        crs=geo["DELHI"].crs,
     )
 
-    max_w, min_w = 8, 0.5
-    vmin, vmax = gdf_flows["volume"].min(), gdf_flows["volume"].max()
 
-    if vmax == vmin:
-        lw = pd.Series([max_w] * len(gdf_flows))
-    else:
-        lw = (
-            (gdf_flows["volume"] - vmin) / (vmax - vmin) * (max_w - min_w) + min_w
-        )
+def build_flow_gdf(df_filtered: pd.DataFrame) -> gpd.GeoDataFrame:
+    return od_flows_gdf(od_matrix(df_filtered["Pickup region"], df_filtered["Drop region"]))
+
+
+def flows_to_gdf(flows: pd.DataFrame) -> gpd.GeoDataFrame:
+    return od_flows_gdf(od_matrix(flows["Pickup region"], flows["Drop region"], flows["volume"]))
+
+
+class _FlowMapCanvas:
+    """Persistent flow-map figure for one figure size and DPI.
+
+    The district polygons are rendered once into a cached background and the
+    labels, colorbar and crop box are set up once. Each render restores the
+    background, draws only the flow lines, labels and colorbar on top of it
+    and encodes the cropped buffer as PNG.
+    """
 
     cmap = "plasma"
-    gdf_flows.plot(
-        ax=ax,
-        linewidth=lw,
-        alpha=0.7,
-        cmap=cmap,
-        column="volume",
-        legend=False,
-    )
 
-    for _, r in DELHI.iterrows():
-        ax.text(
-            r.centroid.x,
-            r.centroid.y,
-            r.District,
-            ha="center",
-            va="center",
-            fontsize=9,
-            bbox=dict(facecolor="white", edgecolor="none", pad=0.3, alpha=0.7),
+    def __init__(self, figsize, dpi):
+        import matplotlib as mpl
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        delhi = _geo()["DELHI"]
+        self.lock = threading.Lock()
+        self.fig = Figure(figsize=figsize, dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.fig)
+        self.ax = ax = self.fig.add_subplot(1, 1, 1)
+
+        # Map units per output pixel; the axes are smaller than the figure, so
+        # this errs towards finer geometry
+        minx, miny, maxx, maxy = delhi.total_bounds
+        metres_per_pixel = max((maxx - minx) / (figsize[0] * dpi), (maxy - miny) / (figsize[1] * dpi))
+        basemap_districts(metres_per_pixel).plot(
+            ax=ax,
+            edgecolor="gray",
+            facecolor="#f0f0f0",
+            linewidth=0.8,
         )
+        # Simplified borders keep a subset of the vertices; frame the map on the
+        # full-resolution extent so the view does not shift
+        ax.update_datalim([(minx, miny), (maxx, maxy)])
+        ax.autoscale_view()
 
-    norm = mpl.colors.Normalize(vmin=vmin, vmax=vmax)
-    sm = mpl.cm.ScalarMappable(cmap=cmap, norm=norm)
-    sm.set_array([])
-    cbar = fig.colorbar(
-        sm,
-        ax=ax,
-        orientation="vertical",
-        fraction=0.045,
-        pad=0.04,
-    )
-    cbar.set_label("Ride volume (number of trips)", size=10)
+        self.labels = [
+            ax.text(
+                r.centroid.x,
+                r.centroid.y,
+                r.District,
+                ha="center",
+                va="center",
+                fontsize=9,
+                bbox=dict(facecolor="white", edgecolor="none", pad=0.3, alpha=0.7),
+            )
+            for _, r in delhi.iterrows()
+        ]
+
+        self.mappable = mpl.cm.ScalarMappable(cmap=self.cmap, norm=mpl.colors.Normalize(0, 1))
+        self.mappable.set_array([])
+        self.cbar = self.fig.colorbar(
+            self.mappable,
+            ax=ax,
+            orientation="vertical",
+            fraction=0.045,
+            pad=0.04,
+        )
+        self.cbar.set_label("Ride volume (number of trips)", size=10)
+
+        ax.set_axis_off()
+        self.fig.tight_layout()
+        ax.set_autoscale_on(False)
+
+        # Crop box wide enough for the longest colorbar tick labels we expect
+        self.mappable.set_clim(0, 1_000_000)
+        self.canvas.draw()
+        bbox = self.fig.get_tightbbox(self.canvas.get_renderer()).padded(0.1)
+        x0, y0, x1, y1 = np.round(bbox.transformed(self.fig.dpi_scale_trans).extents).astype(int)
+        height = int(self.fig.bbox.height)
+        self.crop = (
+            slice(max(height - y1, 0), height - max(y0, 0)),
+            slice(max(x0, 0), x1),
+        )
+
+        # Background with the basemap only
+        for artist in self.labels + [self.cbar.ax]:
+            artist.set_visible(False)
+        self.canvas.draw()
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+        for artist in self.labels + [self.cbar.ax]:
+            artist.set_visible(True)
+
+    def render(self, gdf_flows: gpd.GeoDataFrame) -> bytes:
+        import shapely
+        from matplotlib.collections import LineCollection
+        from PIL import Image
+
+        max_w, min_w = 8, 0.5
+        volume = gdf_flows["volume"].to_numpy(dtype=float)
+        vmin, vmax = (volume.min(), volume.max()) if len(volume) else (0, 1)
+
+        if vmax == vmin:
+            lw = np.full(len(volume), max_w)
+        else:
+            lw = (volume - vmin) / (vmax - vmin) * (max_w - min_w) + min_w
+
+        segments = shapely.get_coordinates(gdf_flows.geometry.values).reshape(-1, 2, 2)
+
+        with self.lock:
+            self.mappable.set_clim(vmin, vmax)
+            lines = LineCollection(
+                segments,
+                linewidths=lw,
+                alpha=0.7,
+                cmap=self.cmap,
+                norm=self.mappable.norm,
+            )
+            lines.set_array(volume)
+            self.ax.add_collection(lines, autolim=False)
+
+            self.canvas.restore_region(self.background)
+            self.ax.draw_artist(lines)
+            for label in self.labels:
+                self.ax.draw_artist(label)
+            self.cbar.ax.draw(self.canvas.get_renderer())
+            lines.remove()
+
+            pixels = np.asarray(self.canvas.buffer_rgba())[self.crop][:, :, :3]
+            buf = io.BytesIO()
+            Image.fromarray(pixels).save(buf, format="png")
+        return buf.getvalue()
+
+
+@functools.lru_cache(maxsize=None)
+def _flow_map_canvas(figsize, dpi) -> _FlowMapCanvas:
+    return _FlowMapCanvas(figsize, dpi)
 
-    ax.set_axis_off()
-    fig.tight_layout()
 
-    buf = io.BytesIO()
-    fig.savefig(buf, format="png", dpi=150, bbox_inches="tight")
-    plt.close(fig)          # free memory
-    buf.seek(0)
-    img_base64 = base64.b64encode(buf.read()).decode()
+def render_flow_map(gdf_flows: gpd.GeoDataFrame, figsize=(12, 10), dpi=150) -> str:
+    png = _flow_map_canvas(tuple(figsize), dpi).render(gdf_flows)
+    img_base64 = base64.b64encode(png).decode()
 
     html_str = f"""
     <html>
@@ -303,4 +633,4 @@ def render_flow_map(gdf_flows: gpd.GeoDataFrame) -> str:
       </body>
     </html>
     """
-    return html_str
\ No newline at end of file
+    return html_str
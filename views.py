@@ -0,0 +1,238 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from metrics import scanned
+
+# Upper bound on the in-memory size of the cached selections of each process
+VIEW_CACHE_MB = int(os.environ.get("RIDES_VIEW_CACHE_MB", 128))
+
+
+def view_key(start_date, end_date, vehicle_types) -> tuple:
+    return (
+        pd.Timestamp(start_date),
+        pd.Timestamp(end_date),
+        frozenset(vehicle_types or ()),
+    )
+
+
+def sort_rides(df: pd.DataFrame) -> pd.DataFrame:
+    return df.sort_values(["Date", "Vehicle Type"], kind="stable", ignore_index=True)
+
+
+def concat_rides(frames: list) -> pd.DataFrame:
+    """Concatenate preprocessed rides tables, merging the categories of categorical columns."""
+    columns = {}
+    for name in frames[0].columns:
+        parts = [frame[name] for frame in frames]
+        if all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            # Ordered categoricals (Weekday) share their categories already
+            columns[name] = union_categoricals(parts, sort_categories=not parts[0].cat.ordered)
+        else:
+            columns[name] = pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(columns)
+
+
+def _concat_ranges(starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    lengths = ends - starts
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return offsets + np.arange(lengths.sum())
+
+
+class CachedSelections:
+    """Bounded LRU of filtered ride selections shared by all filter-driven callbacks.
+
+    Cached selections hold only ``columns`` (every column if None) and are
+    bounded both in number and by their in-memory size; the most recently used
+    one is kept even if it alone exceeds ``maxbytes``. Subclasses implement
+    ``_select(start, end, vehicle_types, columns)`` and ``bounds()``.
+    """
+
+    def __init__(self, maxsize: int = 16, maxbytes: int = VIEW_CACHE_MB * 2**20, columns=None):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.columns = list(columns) if columns is not None else None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._views = OrderedDict()
+        self._pending = {}  # key -> Future of a selection being computed
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, start_date, end_date, vehicle_types) -> pd.DataFrame:
+        view = self._get(view_key(start_date, end_date, vehicle_types))
+        scanned(len(view))
+        return view
+
+    def _get(self, key: tuple) -> pd.DataFrame:
+        # Callbacks for one interaction arrive together, so the first one
+        # computes the selection while the others wait for it; the lock is only
+        # held to look up and insert entries, so other selections proceed.
+        with self._lock:
+            cached = self._views.get(key)
+            if cached is not None:
+                self._views.move_to_end(key)
+                self.hits += 1
+                return cached[0]
+            pending = self._pending.get(key)
+            if pending is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+                computing = self._pending[key] = Future()
+        if pending is not None:
+            return pending.result()
+
+        try:
+            view = self._select(*key, self.columns)
+            size = int(view.memory_usage(index=True, deep=True).sum())
+        except BaseException as exc:
+            with self._lock:
+                del self._pending[key]
+            computing.set_exception(exc)
+            raise
+        with self._lock:
+            del self._pending[key]
+            if self.maxsize:
+                self._views[key] = (view, size)
+                self._bytes += size
+            while self._views and (
+                len(self._views) > self.maxsize or self._bytes > self.maxbytes and len(self._views) > 1
+            ):
+                _, (_, evicted) = self._views.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+        computing.set_result(view)
+        return view
+
+    def select(self, start_date, end_date, vehicle_types, columns=None) -> pd.DataFrame:
+        """Uncached selection of ``columns`` (all by default), for callers that keep their own cache."""
+        return self._select(*view_key(start_date, end_date, vehicle_types), columns)
+
+    def append(self, rows: pd.DataFrame) -> "AppendedViews":
+        """Selections over these rides plus the preprocessed ``rows``; ``self`` is left as it is."""
+        return AppendedViews(self, rows, self.maxsize, self.maxbytes, self.columns)
+
+    def clear(self):
+        with self._lock:
+            self._views.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._views),
+                "maxsize": self.maxsize,
+                "bytes": self._bytes,
+                "maxbytes": self.maxbytes,
+                "evictions": self.evictions,
+            }
+
+
+class FilteredViews(CachedSelections):
+    """Selections over one in-memory rides table.
+
+    The rides table must be sorted by Date and by Vehicle Type within each day
+    (see ``sort_rides``). Offset tables over that layout turn a date range into
+    one contiguous slice and a vehicle subset into a few sub-slices per day.
+    """
+
+    def __init__(self, df: pd.DataFrame, maxsize: int = 16, maxbytes: int = VIEW_CACHE_MB * 2**20,
+                 columns=None):
+        super().__init__(maxsize, maxbytes, columns)
+        self.df = df
+
+        self.days, day = np.unique(df["Date"].to_numpy(), return_inverse=True)
+        vehicle, self.vehicle_types = pd.factorize(df["Vehicle Type"], sort=True)
+        self.vehicle_types = np.asarray(self.vehicle_types.astype(object))
+        # Rides without a vehicle type are sorted last within their day
+        n_slots = len(self.vehicle_types) + 1
+        vehicle[vehicle < 0] = n_slots - 1
+
+        cell = day * n_slots + vehicle
+        if np.any(np.diff(cell) < 0):
+            raise ValueError("Rides must be sorted by Date and Vehicle Type")
+        # Rows of cell (d, v) are self.offsets[d, v]:self.offsets[d, v + 1]
+        starts = np.searchsorted(cell, np.arange(len(self.days) * n_slots + 1))
+        self.offsets = starts[np.arange(len(self.days))[:, None] * n_slots + np.arange(n_slots + 1)]
+
+    def bounds(self) -> tuple:
+        """First and last day with rides."""
+        if len(self.days) == 0:
+            return None, None
+        return pd.Timestamp(self.days[0]), pd.Timestamp(self.days[-1])
+
+    def _select(self, start, end, vehicle_types, columns=None) -> pd.DataFrame:
+        # Only the requested columns are gathered
+        df = self.df if columns is None else self.df[columns]
+        first = np.searchsorted(self.days, np.datetime64(start), side="left")
+        last = np.searchsorted(self.days, np.datetime64(end), side="right")
+
+        # Runs of consecutive selected vehicle types are contiguous within a day
+        selected = np.append(np.isin(self.vehicle_types, list(vehicle_types)), False)
+        edges = np.diff(np.concatenate([[False], selected]).astype(np.int8))
+        run_starts, run_ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+        offsets = self.offsets[first:last]
+        starts = offsets[:, run_starts].ravel()
+        ends = offsets[:, run_ends].ravel()
+        nonempty = ends > starts
+        starts, ends = starts[nonempty], ends[nonempty]
+        if len(starts) == 0:
+            return df.iloc[0:0]
+
+        # Merge runs that touch across day boundaries
+        breaks = np.flatnonzero(starts[1:] != ends[:-1]) + 1
+        starts = starts[np.concatenate([[0], breaks])]
+        ends = ends[np.concatenate([breaks - 1, [len(ends) - 1]])]
+        if len(starts) == 1:
+            return df.iloc[starts[0]:ends[0]]
+        return df.iloc[_concat_ranges(starts, ends)]
+
+
+class AppendedViews(CachedSelections):
+    """Selections over ``base`` plus rows appended since it was loaded.
+
+    The appended rows are kept, sorted, in a table of their own, so appending
+    costs time and memory in those rows only and ``base`` (possibly memory-mapped
+    or shared copy-on-write) is never copied.
+    """
+
+    def __init__(self, base: CachedSelections, rows: pd.DataFrame, maxsize: int = 16,
+                 maxbytes: int = VIEW_CACHE_MB * 2**20, columns=None):
+        super().__init__(maxsize, maxbytes, columns)
+        self.base = base
+        self.recent = FilteredViews(sort_rides(rows), maxsize=0)
+
+    def append(self, rows: pd.DataFrame) -> "AppendedViews":
+        return AppendedViews(
+            self.base, concat_rides([self.recent.df, rows]), self.maxsize, self.maxbytes, self.columns
+        )
+
+    def bounds(self) -> tuple:
+        bounds = [bound for bound in (*self.base.bounds(), *self.recent.bounds()) if bound is not None]
+        if not bounds:
+            return None, None
+        return min(bounds), max(bounds)
+
+    def _select(self, start, end, vehicle_types, columns=None) -> pd.DataFrame:
+        view = self.base._select(start, end, vehicle_types, columns)
+        recent = self.recent._select(start, end, vehicle_types, columns)
+        if not len(recent):
+            return view
+        if not len(view):
+            return recent
+        return concat_rides([view, recent])
+
+    def stats(self) -> dict:
+        return {**super().stats(), "appended_rows": len(self.recent.df)}
@@ -0,0 +1,33 @@
+"""WSGI entry point for production servers.
+
+    gunicorn "wsgi:create_app()" --preload --workers 4 --worker-class gthread --threads 4
+
+With ``--preload`` the rides table and the aggregates built from it are
+loaded once in the master process; forked workers share those pages
+copy-on-write. ``serve.py`` wraps this setup.
+"""
+
+
+def warm_up(dashboard):
+    # Build the objects every worker would otherwise create on its first
+    # request (default filtered view, flow-map figure) while still in the master
+    first, last = dashboard.data.bounds
+    if first is None:
+        return
+    start_date, end_date = dashboard.initial_range(first, last)
+    vehicle_types = [option["value"] for option in dashboard.vehicle_options]
+    if not dashboard.flow_maps.processes:
+        # Pool processes warm themselves up; starting them here would leave
+        # the forked workers with a pool they cannot use
+        dashboard.update_flow_map(start_date, end_date, vehicle_types)
+    dashboard.update_scatterplot(start_date, end_date, vehicle_types, "Ride Distance", "Avg Speed")
+
+
+def create_app(warm: bool = True):
+    import app as dashboard
+
+    if warm:
+        warm_up(dashboard)
+        # Forked workers would otherwise all report the warm-up calls as traffic
+        dashboard.call_metrics.reset()
+    return dashboard.app.server